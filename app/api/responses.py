@@ -0,0 +1,57 @@
+"""Content negotiation helpers for data heavy responses."""
+
+import polars as pl
+from fastapi import Response
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+COLUMNAR_MEDIA_TYPE = "application/vnd.portfoliobuilder.columnar+json"
+ARROW_RESPONSE: dict[int | str, dict[str, object]] = {200: {"content": {ARROW_STREAM_MEDIA_TYPE: {}}}}
+
+
+def accepts(accept: str | None, media_type: str) -> bool:
+    """Check whether an Accept header explicitly allows a media type.
+
+    Parameters
+    ----------
+    accept : str | None
+        Accept header
+    media_type : str
+        media type to check
+
+    Returns
+    -------
+    bool
+        True if media type is listed without q=0
+    """
+    if accept is None:
+        return False
+    for value in accept.split(","):
+        _media_type, *params = (i.strip() for i in value.split(";"))
+        if _media_type.lower() != media_type:
+            continue
+        q_values = [param.split("=", 1)[1] for param in params if param.startswith("q=")]
+        try:
+            return not q_values or float(q_values[0]) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def arrow_response(df: pl.DataFrame, headers: dict[str, str] | None = None) -> Response:
+    """Serialise dataframe as an Arrow IPC stream.
+
+    Parameters
+    ----------
+    df : pl.DataFrame
+        dataframe to return
+    headers : dict[str, str] | None, optional
+        additional response headers, by default None
+
+    Returns
+    -------
+    Response
+        response with Arrow IPC stream body
+    """
+    # Oldest compat level keeps the stream readable by older pyarrow versions
+    body = df.write_ipc_stream(None, compat_level=pl.CompatLevel.oldest())
+    return Response(content=body.getvalue(), media_type=ARROW_STREAM_MEDIA_TYPE, headers=headers)
@@ -1,12 +1,38 @@
 """Backtesting APIRouter."""
 
-import polars as pl
-from fastapi import APIRouter, HTTPException
+from typing import Annotated, Literal
 
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+
+from app.api.responses import (
+    ARROW_RESPONSE,
+    ARROW_STREAM_MEDIA_TYPE,
+    COLUMNAR_MEDIA_TYPE,
+    accepts,
+    arrow_response,
+)
 from app.config import settings
-from app.models import BacktestResult, BacktestScenario, Holding, PortfolioValue
-from app.portfolio_analysis.backtest import backtest
-from app.portfolio_analysis.metrics import get_portfolio_metrics
+from app.executor import analysis_executor
+from app.loader import security_registry
+from app.models import (
+    BacktestResult,
+    BacktestScenario,
+    BatchBacktestResult,
+    BatchBacktestScenario,
+    BatchPortfolioResult,
+    ColumnarBacktestResult,
+    ColumnarPortfolioValues,
+    Holding,
+    PortfolioValue,
+    RollingBacktestResult,
+    RollingPortfolioMetrics,
+    SimulationResult,
+    SimulationScenario,
+)
+from app.portfolio_analysis.backtest import backtest, batch_backtest
+from app.portfolio_analysis.metrics import get_portfolio_metrics, get_portfolio_metrics_batch
+from app.portfolio_analysis.rolling import get_rolling_metrics
+from app.portfolio_analysis.simulation import simulate
 
 router = APIRouter()
 
@@ -24,25 +50,39 @@ def get_invalid_ids(ids: list[str]) -> list[str]:
     list[str]
         list of invalid ids
     """
-    available_ids = (
-        pl.scan_parquet(settings.security_details).filter(pl.col("id").is_in(ids)).collect()["id"].to_list()
-    )
-    not_available = [_id for _id in ids if _id not in available_ids]
-    return not_available
+    return security_registry.get_invalid_ids(ids)
 
 
-@router.post("")
-def backtest_portfolio(backtest_scenario: BacktestScenario) -> BacktestResult:
+@router.post("", response_model=BacktestResult | ColumnarBacktestResult, responses=ARROW_RESPONSE)
+def backtest_portfolio(
+    backtest_scenario: BacktestScenario,
+    layout: Literal["rows", "columnar"] = "rows",
+    extended_metrics: bool = False,
+    risk_free_rate: float = 0.0,
+    accept: Annotated[str | None, Header()] = None,
+) -> BacktestResult | ColumnarBacktestResult | Response:
     """Backtest portfolio.
 
     Parameters
     ----------
     backtest_scenario : BacktestScenario
         backtest settings
+    layout : Literal["rows", "columnar"], optional
+        - rows: list of portfolio values with holding breakdown per month
+        - columnar: one list of values per column, also selected with the
+          application/vnd.portfoliobuilder.columnar+json Accept header
+    extended_metrics : bool, optional
+        include Sharpe, Sortino and Calmar ratios, value at risk, drawdown duration and
+        best / worst month in metrics, by default False
+    risk_free_rate : float, optional
+        annual risk free rate for Sharpe and Sortino ratios, by default 0.0
+    accept : str | None, optional
+        Accept header, application/vnd.apache.arrow.stream returns portfolio values as
+        an Arrow IPC stream with metrics in the X-Portfolio-Metrics header
 
     Returns
     -------
-    BacktestResult
+    BacktestResult | ColumnarBacktestResult | Response
         backtest result
 
     Raises
@@ -57,7 +97,25 @@ def backtest_portfolio(backtest_scenario: BacktestScenario) -> BacktestResult:
             status_code=404,
             detail=f"Following securities are not available: {not_available}",
         )
-    _portfolio_values = backtest(backtest_scenario)
+    _portfolio_values = analysis_executor.run(backtest, backtest_scenario)
+    metrics = get_portfolio_metrics(
+        _portfolio_values,
+        backtest_scenario.start_date,
+        backtest_scenario.end_date,
+        extended_metrics,
+        risk_free_rate,
+    )
+    if accepts(accept, ARROW_STREAM_MEDIA_TYPE):
+        return arrow_response(_portfolio_values, headers={"X-Portfolio-Metrics": metrics.model_dump_json()})
+    if layout == "columnar" or accepts(accept, COLUMNAR_MEDIA_TYPE):
+        return ColumnarBacktestResult(
+            metrics=metrics,
+            portfolio_values=ColumnarPortfolioValues(
+                dates=_portfolio_values["date"].to_list(),
+                portfolio_value=_portfolio_values["portfolio_value"].to_list(),
+                holdings=_portfolio_values.drop("date", "portfolio_value").to_dict(as_series=False),
+            ),
+        )
     portfolio_values = [
         PortfolioValue(
             date=row["date"],
@@ -70,10 +128,138 @@ def backtest_portfolio(backtest_scenario: BacktestScenario) -> BacktestResult:
         )
         for row in _portfolio_values.to_dicts()
     ]
-    metrics = get_portfolio_metrics(
-        _portfolio_values, backtest_scenario.start_date, backtest_scenario.end_date
-    )
     return BacktestResult(
         metrics=metrics,
         portfolio_values=portfolio_values,
     )
+
+
+@router.post("/batch")
+def batch_backtest_portfolios(
+    batch_scenario: BatchBacktestScenario,
+    include_values: bool = False,
+    extended_metrics: bool = False,
+    risk_free_rate: float = 0.0,
+) -> BatchBacktestResult:
+    """Backtest many portfolios sharing a date range in a single pass.
+
+    Parameters
+    ----------
+    batch_scenario : BatchBacktestScenario
+        batch backtest settings
+    include_values : bool, optional
+        include portfolio value per month for each portfolio, by default False
+    extended_metrics : bool, optional
+        include extended metrics for each portfolio, by default False
+    risk_free_rate : float, optional
+        annual risk free rate for Sharpe and Sortino ratios, by default 0.0
+
+    Returns
+    -------
+    BatchBacktestResult
+        metrics (and optionally portfolio values) for each portfolio
+
+    Raises
+    ------
+    HTTPException
+        Exception if invalid ids are provided.
+    """
+    ids = list(dict.fromkeys(i.id for portfolio in batch_scenario.portfolios for i in portfolio))
+    not_available = get_invalid_ids(ids)
+    if len(not_available):
+        raise HTTPException(
+            status_code=404,
+            detail=f"Following securities are not available: {not_available}",
+        )
+    if len(ids) == 0:
+        return BatchBacktestResult(results=[])
+    dates, portfolio_values = analysis_executor.run(batch_backtest, batch_scenario)
+    metrics = get_portfolio_metrics_batch(
+        portfolio_values,
+        batch_scenario.start_date,
+        batch_scenario.end_date,
+        extended_metrics,
+        risk_free_rate,
+    )
+    results = [
+        BatchPortfolioResult(
+            metrics=_metrics,
+            portfolio_values=portfolio_values[:, i].tolist() if include_values else None,
+        )
+        for i, _metrics in enumerate(metrics)
+    ]
+    return BatchBacktestResult(dates=dates.to_list() if include_values else None, results=results)
+
+
+@router.post("/rolling")
+def rolling_backtest_portfolio(
+    backtest_scenario: BacktestScenario, window: Annotated[int, Query(ge=2)] = 12
+) -> RollingBacktestResult:
+    """Backtest portfolio and calculate metrics over rolling windows.
+
+    Parameters
+    ----------
+    backtest_scenario : BacktestScenario
+        backtest settings
+    window : int, optional
+        number of monthly returns in each window, e.g. 12, 36 or 60, by default 12
+
+    Returns
+    -------
+    RollingBacktestResult
+        metrics for each window, dated by the last month in the window
+
+    Raises
+    ------
+    HTTPException
+        Exception if invalid ids are provided.
+    """
+    not_available = get_invalid_ids([i.id for i in backtest_scenario.portfolio])
+    if len(not_available):
+        raise HTTPException(
+            status_code=404,
+            detail=f"Following securities are not available: {not_available}",
+        )
+    portfolio_values = analysis_executor.run(backtest, backtest_scenario)
+    metrics = get_rolling_metrics(portfolio_values["portfolio_value"].to_numpy(), window)
+    dates = portfolio_values["date"].to_list()[window:]
+    return RollingBacktestResult(
+        window=window,
+        metrics=[
+            RollingPortfolioMetrics(
+                date=_date, **{name: float(values[i]) for name, values in metrics.items()}
+            )
+            for i, _date in enumerate(dates)
+        ],
+    )
+
+
+@router.post("/simulate")
+def simulate_portfolio(simulation_scenario: SimulationScenario) -> SimulationResult:
+    """Simulate forward portfolio values by block bootstrap or from a multivariate normal.
+
+    Parameters
+    ----------
+    simulation_scenario : SimulationScenario
+        simulation settings
+
+    Returns
+    -------
+    SimulationResult
+        percentile bands of portfolio value per month and terminal value statistics
+
+    Raises
+    ------
+    HTTPException
+        Exception if invalid ids are provided or there is not enough history.
+    """
+    not_available = get_invalid_ids([i.id for i in simulation_scenario.portfolio])
+    if len(not_available):
+        raise HTTPException(
+            status_code=404,
+            detail=f"Following securities are not available: {not_available}",
+        )
+    try:
+        return analysis_executor.run(simulate, simulation_scenario, settings.simulation_chunk_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
@@ -1,56 +1,72 @@
 """Optimisation APIRouter."""
 
-from typing import Literal
+from typing import Annotated, Literal
 
 import numpy as np
 import polars as pl
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, Response
 
-from app.loader import load_returns
+from app.api.responses import ARROW_RESPONSE, ARROW_STREAM_MEDIA_TYPE, accepts, arrow_response
+from app.config import settings
+from app.executor import analysis_executor
 from app.models import (
+    CacheStats,
     EfficientFrontierPortfolio,
     ExpectedReturn,
     Holding,
+    OptimisationResult,
     OptimisationScenario,
 )
-from app.portfolio_analysis.expected_returns import get_historical_expected_returns
-from app.portfolio_analysis.metrics import get_portfolio_std
-from app.portfolio_analysis.optimisation import get_min_vol_portfolio
-from app.portfolio_analysis.risk_models import (
-    get_leodit_wolf_covariance,
-    get_sample_covariance,
+from app.portfolio_analysis.critical_line import get_critical_line_frontier
+from app.portfolio_analysis.estimator_cache import (
+    estimator_cache,
+    get_cached_expected_returns,
+    get_cached_risk_model,
 )
+from app.portfolio_analysis.metrics import get_portfolio_std
+from app.portfolio_analysis.optimisation import get_efficient_frontier, get_mean_variance_portfolio
 
 router = APIRouter()
 
 
-@router.post("/expected-returns")
-def get_expected_returns(scenario: OptimisationScenario) -> list[ExpectedReturn]:
+@router.post("/expected-returns", response_model=list[ExpectedReturn], responses=ARROW_RESPONSE)
+def get_expected_returns(
+    scenario: OptimisationScenario, accept: Annotated[str | None, Header()] = None
+) -> list[ExpectedReturn] | Response:
     """Get expected returns based on historical returns.
 
     Parameters
     ----------
     scenario : OptimisationScenario
         optimisation settings
+    accept : str | None, optional
+        Accept header, application/vnd.apache.arrow.stream returns an Arrow IPC stream
 
     Returns
     -------
-    list[ExpectedReturn]
+    list[ExpectedReturn] | Response
         expected returns for each security
     """
-    security_returns = load_returns(scenario.ids, scenario.start_date, scenario.end_date)
-    _expected_returns = get_historical_expected_returns(security_returns, scenario.ids)
-    expected_returns = _expected_returns.unpivot(
-        value_name="expected_return", variable_name="id"
-    ).to_dicts()
-    expected_returns = [ExpectedReturn.model_validate(i) for i in expected_returns]
+    _expected_returns = pl.DataFrame(
+        {
+            "id": scenario.ids,
+            "expected_return": get_cached_expected_returns(
+                scenario.ids, scenario.start_date, scenario.end_date
+            ),
+        }
+    )
+    if accepts(accept, ARROW_STREAM_MEDIA_TYPE):
+        return arrow_response(_expected_returns)
+    expected_returns = [ExpectedReturn.model_validate(i) for i in _expected_returns.to_dicts()]
     return expected_returns
 
 
-@router.post("/risk-model")
+@router.post("/risk-model", response_model=list[dict[str, str | float]], responses=ARROW_RESPONSE)
 def get_risk_model(
-    scenario: OptimisationScenario, method: Literal["sample_cov", "ledoit_wolf"]
-) -> list[dict[str, str | float]]:
+    scenario: OptimisationScenario,
+    method: Literal["sample_cov", "ledoit_wolf"],
+    accept: Annotated[str | None, Header()] = None,
+) -> list[dict[str, str | float]] | Response:
     """Get risk models for securities.
 
     Parameters
@@ -60,57 +76,81 @@ def get_risk_model(
     method : Literal["sample_cov", "ledoit_wolf"]
         - sample_cov: sample covariance
         - leodit_wolf: leodit wolf shrink covariance
+    accept : str | None, optional
+        Accept header, application/vnd.apache.arrow.stream returns an Arrow IPC stream
 
     Returns
     -------
-    list[dict[str, str | float]]
+    list[dict[str, str | float]] | Response
         covariance matrix
     """
-    security_returns = load_returns(scenario.ids, scenario.start_date, scenario.end_date)
-    _security_returns = security_returns.select(pl.col(scenario.ids)).to_numpy()
-    match method:
-        case "sample_cov":
-            covariance = get_sample_covariance(_security_returns)
-        case "ledoit_wolf":
-            covariance = get_leodit_wolf_covariance(_security_returns)
-
-    _risk_model = pl.from_numpy(covariance, schema=dict.fromkeys(scenario.ids, pl.Float64))
-
-    risk_model: list[dict[str, str | float]] = (
-        _risk_model.with_columns(pl.Series(scenario.ids).alias("id"))
+    covariance = get_cached_risk_model(scenario.ids, scenario.start_date, scenario.end_date, method)
+    _risk_model = (
+        pl.from_numpy(covariance, schema=dict.fromkeys(scenario.ids, pl.Float64))
+        .with_columns(pl.Series(scenario.ids).alias("id"))
         .select(["id", *scenario.ids])
-        .to_dicts()
     )
+    if accepts(accept, ARROW_STREAM_MEDIA_TYPE):
+        return arrow_response(_risk_model)
+    risk_model: list[dict[str, str | float]] = _risk_model.to_dicts()
     return risk_model
 
 
+def set_optimiser_headers(response: Response, results: list[OptimisationResult]) -> None:
+    """Report total solver iterations and evaluations in response headers.
+
+    Parameters
+    ----------
+    response : Response
+        response to add headers to
+    results : list[OptimisationResult]
+        optimisation results
+    """
+    response.headers["X-Optimiser-Iterations"] = str(sum(i.n_iterations for i in results))
+    response.headers["X-Optimiser-Function-Evaluations"] = str(
+        sum(i.n_function_evaluations for i in results)
+    )
+    response.headers["X-Optimiser-Gradient-Evaluations"] = str(
+        sum(i.n_gradient_evaluations for i in results)
+    )
+
+
 @router.post("/mean-variance")
-def mean_variance_optimisation(scenario: OptimisationScenario) -> list[Holding]:
+def mean_variance_optimisation(scenario: OptimisationScenario, response: Response) -> list[Holding]:
     """Run mean variance optimisation.
 
     Parameters
     ----------
     scenario : OptimisationScenario
         optimisation settings
+    response : Response
+        response, solver statistics are returned in X-Optimiser-* headers
 
     Returns
     -------
     list[Holding]
         list of holdings for mean variance portfolio
     """
-    security_returns = load_returns(scenario.ids, scenario.start_date, scenario.end_date)
-    expected_returns = get_historical_expected_returns(security_returns, scenario.ids).to_numpy().T
-    sample_covariance = get_sample_covariance(security_returns.select(pl.col(scenario.ids)).to_numpy())
-    constraints = ({"type": "eq", "fun": lambda x: np.sum(x) - 1},)
-    min_vol_portfolio = get_min_vol_portfolio(expected_returns, sample_covariance, constraints)
+    expected_returns = get_cached_expected_returns(scenario.ids, scenario.start_date, scenario.end_date)
+    sample_covariance = get_cached_risk_model(
+        scenario.ids, scenario.start_date, scenario.end_date, "sample_cov"
+    )
+    min_vol_portfolio: OptimisationResult = analysis_executor.run(
+        get_mean_variance_portfolio, expected_returns, sample_covariance
+    )
+    set_optimiser_headers(response, [min_vol_portfolio])
     return [
-        Holding(id=id, amount=ratio) for id, ratio in zip(scenario.ids, min_vol_portfolio, strict=False)
+        Holding(id=id, amount=ratio)
+        for id, ratio in zip(scenario.ids, min_vol_portfolio.weights, strict=False)
     ]
 
 
 @router.post("/efficient-frontier")
 def efficient_frontier(
-    scenario: OptimisationScenario, n_portfolios: int = 5
+    scenario: OptimisationScenario,
+    response: Response,
+    n_portfolios: int = 5,
+    method: Literal["slsqp", "cla"] = "slsqp",
 ) -> list[EfficientFrontierPortfolio]:
     """Generate efficient frontier portfolios.
 
@@ -118,37 +158,56 @@ def efficient_frontier(
     ----------
     scenario : OptimisationScenario
         optimisation settings
+    response : Response
+        response, solver statistics are returned in X-Optimiser-* headers
     n_portfolios : int, optional
         number of portfolios to generate, by default 5
+    method : Literal["slsqp", "cla"], optional
+        - slsqp: solve minimum volatility portfolio for each target return
+        - cla: critical line algorithm, interpolate between corner portfolios
+        by default "slsqp"
 
     Returns
     -------
     list[EfficientFrontierPortfolio]
         list of portfolios lying on efficient frontier
     """
-    security_returns = load_returns(scenario.ids, scenario.start_date, scenario.end_date)
-    expected_returns = get_historical_expected_returns(security_returns, scenario.ids).to_numpy().T
-    sample_covariance = get_sample_covariance(security_returns.select(pl.col(scenario.ids)).to_numpy())
-    efficient_portfolios = []
-    for target_return in np.linspace(min(expected_returns), max(expected_returns), n_portfolios):
-        constraints = (
-            {
-                "type": "eq",
-                "fun": lambda x: np.sum(expected_returns.T * x) - target_return,  # noqa: B023
-            },
-            {"type": "eq", "fun": lambda x: np.sum(x) - 1},
-        )
-        min_vol_portfolio = get_min_vol_portfolio(expected_returns, sample_covariance, constraints)
-        efficient_portfolios.append(
-            EfficientFrontierPortfolio(
-                portfolio=[
-                    Holding(id=id, amount=ratio)
-                    for id, ratio in zip(scenario.ids, min_vol_portfolio, strict=False)
-                ],
-                expected_return=np.sum(expected_returns.T * np.array(min_vol_portfolio)),
-                implied_standard_deviation=get_portfolio_std(
-                    np.array(min_vol_portfolio), sample_covariance
-                ),
+    expected_returns = get_cached_expected_returns(scenario.ids, scenario.start_date, scenario.end_date)
+    sample_covariance = get_cached_risk_model(
+        scenario.ids, scenario.start_date, scenario.end_date, "sample_cov"
+    )
+    match method:
+        case "slsqp":
+            _, results = analysis_executor.run(
+                get_efficient_frontier,
+                expected_returns,
+                sample_covariance,
+                n_portfolios,
+                settings.frontier_max_workers,
+                settings.frontier_segment_size,
+            )
+            set_optimiser_headers(response, results)
+            frontier_weights = np.array([i.weights for i in results])
+        case "cla":
+            _, frontier_weights, n_corners = analysis_executor.run(
+                get_critical_line_frontier, expected_returns, sample_covariance, n_portfolios
             )
+            response.headers["X-Corner-Portfolios"] = str(n_corners)
+
+    efficient_portfolios = [
+        EfficientFrontierPortfolio(
+            portfolio=[
+                Holding(id=id, amount=ratio) for id, ratio in zip(scenario.ids, weights, strict=False)
+            ],
+            expected_return=np.sum(expected_returns * weights),
+            implied_standard_deviation=get_portfolio_std(weights, sample_covariance),
         )
+        for weights in frontier_weights
+    ]
     return efficient_portfolios
+
+
+@router.get("/cache")
+def get_cache_stats() -> CacheStats:
+    """Get hit / miss statistics for cached expected returns and risk models."""
+    return estimator_cache.stats()
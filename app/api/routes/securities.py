@@ -1,32 +1,127 @@
 """Securities APIRouter."""
 
-import polars as pl
-from fastapi import APIRouter, HTTPException
+import gzip
+import hashlib
+from functools import lru_cache
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from pydantic import TypeAdapter
 
 from app.config import settings
-from app.models import SecurityDetails
+from app.loader import security_registry
+from app.models import SecurityDetails, SecurityLookup, SecurityLookupResult
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover
+    brotli = None
 
 router = APIRouter()
 
 
+@lru_cache(maxsize=1)
+def serialize_all_details(version: int) -> dict[str, tuple[bytes, str]]:
+    """Serialize details for all securities once per dataset version.
+
+    Parameters
+    ----------
+    version : int
+        security registry version, a new version invalidates the cache
+
+    Returns
+    -------
+    dict[str, tuple[bytes, str]]
+        body and strong ETag for each content encoding
+    """
+    body = TypeAdapter(list[SecurityDetails]).dump_json(security_registry.details)
+    digest = hashlib.sha256(body).hexdigest()
+    variants = {
+        "identity": (body, f'"{digest}"'),
+        "gzip": (gzip.compress(body, mtime=0), f'"{digest}-gzip"'),
+    }
+    if brotli is not None:
+        variants["br"] = (brotli.compress(body), f'"{digest}-br"')
+    return variants
+
+
+def _get_accepted_encodings(accept_encoding: str) -> set[str]:
+    """Parse Accept-Encoding header, ignoring encodings with q=0."""
+    encodings = set()
+    for value in accept_encoding.split(","):
+        encoding, *params = (i.strip() for i in value.split(";"))
+        q_values = [param.split("=", 1)[1] for param in params if param.startswith("q=")]
+        try:
+            if q_values and float(q_values[0]) == 0:
+                continue
+        except ValueError:
+            continue
+        encodings.add(encoding.lower())
+    return encodings
+
+
 @router.get(
     "/all/",
     summary="Get details for all securities",
     description="Get details for all supported UK securities.",
+    response_model=list[SecurityDetails],
 )
-def get_all_details() -> list[SecurityDetails]:
-    """Load details for all securities."""
-    _all_details = pl.read_parquet(settings.security_details).to_dicts()
-    all_details = [SecurityDetails.model_validate(i) for i in _all_details]
-    return all_details
+async def get_all_details(request: Request) -> Response:
+    """Load details for all securities, served pre-serialized with ETag caching."""
+    variants = serialize_all_details(security_registry.version)
+    accepted = _get_accepted_encodings(request.headers.get("accept-encoding", ""))
+    encoding = next((i for i in ("br", "gzip") if i in variants and i in accepted), "identity")
+    body, etag = variants[encoding]
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.securities_max_age}",
+        "Vary": "Accept-Encoding",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        known_etags = {i[1] for i in variants.values()}
+        requested_etags = {i.strip().removeprefix("W/") for i in if_none_match.split(",")}
+        if "*" in requested_etags or requested_etags & known_etags:
+            return Response(status_code=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.post(
+    "/lookup",
+    summary="Get security details in bulk",
+    description="Resolve many security ids and / or sedols in a single call.",
+)
+def lookup_details(security_lookup: SecurityLookup) -> SecurityLookupResult:
+    """Get details for many securities by id and / or sedol."""
+    securities: dict[str, SecurityDetails] = {}
+    missing_ids = []
+    missing_sedols = []
+    for _id in security_lookup.ids:
+        security = security_registry.get_by_id(_id)
+        if security is None:
+            missing_ids.append(_id)
+        else:
+            securities[security.id] = security
+    for sedol in security_lookup.sedols:
+        security = security_registry.get_by_sedol(sedol)
+        if security is None:
+            missing_sedols.append(sedol)
+        else:
+            securities[security.id] = security
+    return SecurityLookupResult(
+        securities=list(securities.values()),
+        missing_ids=missing_ids,
+        missing_sedols=missing_sedols,
+    )
 
 
 @router.get("/{sedol}/", summary="Get security details by sedol")
 def get_details_by_sedol(sedol: str) -> SecurityDetails:
     """Get details for single security by sedol."""
-    _security_details = (
-        pl.scan_parquet(settings.security_details).filter(pl.col("sedol") == sedol).collect().to_dicts()
-    )
-    if len(_security_details) == 0:
+    security_details = security_registry.get_by_sedol(sedol)
+    if security_details is None:
         raise HTTPException(status_code=404, detail=f"sedol: {sedol} does not exist")
-    return SecurityDetails.model_validate(_security_details[0])
+    return security_details
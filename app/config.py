@@ -10,6 +10,14 @@ class Settings(BaseSettings):
     version: str = "1.0.0"
     security_details: str = "sample/security_details.pq"
     security_returns: str = "sample/security_returns.pq"
+    securities_max_age: int = 3600
+    frontier_max_workers: int = 1
+    frontier_segment_size: int = 25
+    estimator_cache_size: int = 256
+    prefix_covariance: bool = True
+    simulation_chunk_size: int = 4_000_000
+    analysis_workers: int = 0
+    analysis_max_queue_depth: int = 32
 
 
 settings = Settings()
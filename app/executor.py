@@ -0,0 +1,111 @@
+"""Process pool for CPU bound analysis, keeping the GIL of the serving process free."""
+
+import threading
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+
+from app.config import settings
+from app.loader import returns_store
+
+
+class AnalysisQueueFullError(Exception):
+    """Raised when more analysis calls are in flight than workers and queue depth allow."""
+
+
+def _initialise_worker() -> None:
+    """Load returns in a new worker, forked workers inherit an already loaded store."""
+    # Workers run analysis inline rather than dispatching to a copy of the parent's pool
+    analysis_executor.max_workers = 0
+    analysis_executor._pool = None
+    if not returns_store.is_loaded:
+        returns_store.load()
+
+
+class AnalysisExecutor:
+    """Dispatch CPU bound analysis to a process pool with bounded admission.
+
+    Calls block the (threadpool) thread serving the request while a worker process does the work, so
+    solvers and numpy / polars passes do not contend for the GIL with the event loop. With no workers,
+    analysis runs inline in the calling thread. At most max_workers + max_queue_depth calls are
+    admitted at once, further calls are rejected rather than queued without bound.
+    """
+
+    def __init__(self, max_workers: int, max_queue_depth: int) -> None:
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self._pool: ProcessPoolExecutor | None = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Number of analysis calls running or waiting for a worker."""
+        return self._pending
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Process pool, created on first use."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers, initializer=_initialise_worker
+                )
+            return self._pool
+
+    def start(self) -> None:
+        """Start workers up front, after returns are loaded so forked workers share them."""
+        if self.max_workers > 0:
+            pool = self._get_pool()
+            # Workers are started on demand, submitting one task per worker starts them all
+            wait([pool.submit(int) for _ in range(self.max_workers)])
+
+    def shutdown(self) -> None:
+        """Shut down the process pool, waiting for running analysis to finish."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run function in a worker process and wait for the result.
+
+        Parameters
+        ----------
+        func : Callable[..., Any]
+            module level (picklable) function to run
+        *args : Any
+            picklable arguments for function
+
+        Returns
+        -------
+        Any
+            result of function
+
+        Raises
+        ------
+        AnalysisQueueFullError
+            if max_workers + max_queue_depth calls are already in flight
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue_depth:
+                raise AnalysisQueueFullError("Too many analysis requests in flight, retry later")
+            self._pending += 1
+        try:
+            if self.max_workers == 0:
+                return func(*args)
+            pool = self._get_pool()
+            try:
+                return pool.submit(func, *args).result()
+            except BrokenProcessPool:
+                # Replace the pool if a worker died, e.g. killed for running out of memory
+                with self._lock:
+                    if self._pool is pool:
+                        self._pool = None
+                raise
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+
+analysis_executor = AnalysisExecutor(settings.analysis_workers, settings.analysis_max_queue_depth)
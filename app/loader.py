@@ -2,9 +2,352 @@
 
 from datetime import date
 
+import numpy as np
 import polars as pl
 
 from app.config import settings
+from app.models import SecurityDetails
+
+
+class ReturnsStore:
+    """Process-wide store of monthly returns held in memory.
+
+    Returns are read from parquet once and pivoted into a wide, date sorted matrix with one
+    contiguous float64 column per security, so requests only slice rows / columns. A cumulative
+    log(1 + r) index per security lets compounded returns over any date range be read with one
+    subtraction.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._returns: pl.DataFrame | None = None
+        self._dates: np.ndarray = np.array([], dtype="datetime64[D]")
+        self._matrix: np.ndarray = np.empty((0, 0))
+        self._column_index: dict[str, int] = {}
+        self._prefix_missing: np.ndarray = np.empty((0, 0), dtype=np.int64)
+        self._cumulative_log_returns: np.ndarray = np.empty((0, 0))
+        self._prefix_moments: tuple[np.ndarray, np.ndarray] | None = None
+        self._version = 0
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether returns have been loaded into memory."""
+        return self._returns is not None
+
+    @property
+    def version(self) -> int:
+        """Dataset version, incremented every time returns are (re)loaded."""
+        if self._returns is None:
+            self.load()
+        return self._version
+
+    @property
+    def returns(self) -> pl.DataFrame:
+        """Wide returns matrix indexed by date, loaded on first access.
+
+        Returns
+        -------
+        pl.DataFrame
+            date column followed by one column of monthly returns per security
+        """
+        if self._returns is None:
+            self.load()
+        return self._returns  # type: ignore
+
+    @property
+    def ids(self) -> list[str]:
+        """Securities held in the store."""
+        return self.returns.columns[1:]
+
+    def load(self) -> None:
+        """Read returns from parquet, pivot into the wide matrix and build the log return index."""
+        security_returns = (
+            pl.read_parquet(self.path).pivot(on="id", values="monthly_return", index="date").sort("date")
+        )
+        security_returns = security_returns.with_columns(pl.exclude("date").cast(pl.Float64)).rechunk()
+        matrix = np.asfortranarray(security_returns.drop("date").to_numpy())
+        missing = np.isnan(matrix)
+        n_months, n_securities = matrix.shape
+        # Row t of prefix arrays covers the first t months
+        prefix_missing = np.zeros((n_months + 1, n_securities), dtype=np.int64)
+        np.cumsum(missing, axis=0, out=prefix_missing[1:])
+        cumulative_log_returns = np.zeros((n_months + 1, n_securities))
+        np.cumsum(np.log1p(np.where(missing, 0.0, matrix)), axis=0, out=cumulative_log_returns[1:])
+
+        self._dates = security_returns["date"].to_numpy()
+        self._matrix = matrix
+        self._column_index = {_id: i for i, _id in enumerate(security_returns.columns[1:])}
+        self._prefix_missing = prefix_missing
+        self._cumulative_log_returns = cumulative_log_returns
+        self._prefix_moments = None
+        self._returns = security_returns
+        self._version += 1
+
+    @property
+    def prefix_moments(self) -> tuple[np.ndarray, np.ndarray]:
+        """Prefix sums over months for all securities, computed on first access.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]
+            (T+1 x N) sum of returns and (T+1 x N x N) sum of pairwise return products,
+            row t covers the first t months
+        """
+        if self._prefix_moments is None:
+            security_returns = np.nan_to_num(self._get_matrix(), nan=0.0)
+            n_months, n_securities = security_returns.shape
+            prefix_sums = np.zeros((n_months + 1, n_securities))
+            prefix_products = np.zeros((n_months + 1, n_securities, n_securities))
+            np.cumsum(security_returns, axis=0, out=prefix_sums[1:])
+            np.cumsum(
+                security_returns[:, :, None] * security_returns[:, None, :], axis=0, out=prefix_products[1:]
+            )
+            self._prefix_moments = (prefix_sums, prefix_products)
+        return self._prefix_moments
+
+    def _get_matrix(self) -> np.ndarray:
+        """(T x N) returns matrix with nan for missing returns."""
+        if not self.is_loaded:
+            self.load()
+        return self._matrix
+
+    def _get_columns(self, ids: list[str]) -> np.ndarray:
+        """Column positions of securities in the returns matrix."""
+        if not self.is_loaded:
+            self.load()
+        return np.array([self._column_index[_id] for _id in ids], dtype=np.intp)
+
+    def get_row_range(self, start_date: date, end_date: date) -> tuple[int, int]:
+        """Find rows falling between two dates (inclusive) using the sorted date index.
+
+        Parameters
+        ----------
+        start_date : date
+            start date
+        end_date : date
+            end date
+
+        Returns
+        -------
+        tuple[int, int]
+            first row and one past the last row in range
+        """
+        if not self.is_loaded:
+            self.load()
+        start = int(np.searchsorted(self._dates, np.datetime64(start_date, "D"), side="left"))
+        end = int(np.searchsorted(self._dates, np.datetime64(end_date, "D"), side="right"))
+        return start, max(start, end)
+
+    def get_observed_rows(self, ids: list[str], start_date: date, end_date: date) -> np.ndarray:
+        """Rows in a date range where at least one security has a return, matching get_returns.
+
+        Parameters
+        ----------
+        ids : list[str]
+            securities to select
+        start_date : date
+            start date
+        end_date : date
+            end date
+
+        Returns
+        -------
+        np.ndarray
+            row positions in the returns matrix
+        """
+        start, end = self.get_row_range(start_date, end_date)
+        columns = self._get_columns(ids)
+        if np.all(self._prefix_missing[end, columns] == self._prefix_missing[start, columns]):
+            return np.arange(start, end)
+        observed = ~np.isnan(self._matrix[start:end, columns]).all(axis=1)
+        return np.flatnonzero(observed) + start
+
+    def get_returns(self, ids: list[str], start_date: date, end_date: date) -> pl.DataFrame:
+        """Slice returns by security and date range without any I/O.
+
+        Parameters
+        ----------
+        ids : list[str]
+            securities to select
+        start_date : date
+            start date
+        end_date : date
+            end date
+
+        Returns
+        -------
+        pl.DataFrame
+            monthly returns for specified securities and time range
+        """
+        ids = list(dict.fromkeys(ids))
+        start, end = self.get_row_range(start_date, end_date)
+        security_returns = self.returns.slice(start, end - start).select(["date", *ids])
+        # Only keep months where at least one security has a return
+        return security_returns.filter(~pl.all_horizontal(pl.col(ids).is_null()))
+
+    def get_window_log_returns(
+        self, ids: list[str], start_date: date, end_date: date
+    ) -> tuple[int, np.ndarray]:
+        """Compounded log returns over a date range from the cumulative log return index.
+
+        Parameters
+        ----------
+        ids : list[str]
+            securities to select
+        start_date : date
+            start date
+        end_date : date
+            end date
+
+        Returns
+        -------
+        tuple[int, np.ndarray]
+            number of months where at least one security has a return and
+            (N,) sum of log(1 + r), missing returns count as 0
+        """
+        start, end = self.get_row_range(start_date, end_date)
+        columns = self._get_columns(ids)
+        n_obs = self.get_observed_rows(ids, start_date, end_date).shape[0]
+        log_returns = (
+            self._cumulative_log_returns[end, columns] - self._cumulative_log_returns[start, columns]
+        )
+        return n_obs, log_returns
+
+    def get_cumulative_growth(
+        self, ids: list[str], start_date: date, end_date: date
+    ) -> tuple[pl.Series, np.ndarray, np.ndarray]:
+        """Growth of one unit invested in each security from the cumulative log return index.
+
+        Parameters
+        ----------
+        ids : list[str]
+            securities to select
+        start_date : date
+            start date
+        end_date : date
+            end date
+
+        Returns
+        -------
+        tuple[pl.Series, np.ndarray, np.ndarray]
+            dates, (T x N) cumulative growth where return for day 0 is set to 0 and missing
+            returns are treated as 0, and (T x N) mask of missing returns after day 0
+        """
+        rows = self.get_observed_rows(ids, start_date, end_date)
+        columns = self._get_columns(ids)
+        dates = self.returns["date"].gather(rows)
+        if rows.shape[0] == 0:
+            return dates, np.empty((0, columns.shape[0])), np.empty((0, columns.shape[0]), dtype=bool)
+        cumulative_log_returns = self._cumulative_log_returns[np.ix_(rows + 1, columns)]
+        growth = np.exp(cumulative_log_returns - cumulative_log_returns[:1])
+        missing = np.isnan(self._matrix[np.ix_(rows, columns)])
+        missing[:1] = False
+        return dates, growth, missing
+
+    def get_window_moments(
+        self, ids: list[str], start_date: date, end_date: date
+    ) -> tuple[int, np.ndarray, np.ndarray] | None:
+        """Sum of returns and pairwise return products over a date range from prefix sums.
+
+        Cost is O(N^2) in the number of securities, independent of the number of months.
+
+        Parameters
+        ----------
+        ids : list[str]
+            securities to select
+        start_date : date
+            start date
+        end_date : date
+            end date
+
+        Returns
+        -------
+        tuple[int, np.ndarray, np.ndarray] | None
+            number of months, (N,) sum of returns and (N x N) sum of return products,
+            None if any security is missing a return in the date range
+        """
+        start, end = self.get_row_range(start_date, end_date)
+        columns = self._get_columns(ids)
+        if np.any(self._prefix_missing[end, columns] != self._prefix_missing[start, columns]):
+            return None
+        prefix_sums, prefix_products = self.prefix_moments
+        sums = prefix_sums[end, columns] - prefix_sums[start, columns]
+        product_sums = (
+            prefix_products[end][np.ix_(columns, columns)]
+            - prefix_products[start][np.ix_(columns, columns)]
+        )
+        return end - start, sums, product_sums
+
+
+class SecurityRegistry:
+    """Process-wide registry of security details indexed by id and sedol."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._details: list[SecurityDetails] | None = None
+        self._by_id: dict[str, SecurityDetails] = {}
+        self._by_sedol: dict[str, SecurityDetails] = {}
+        self._version = 0
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether security details have been loaded into memory."""
+        return self._details is not None
+
+    @property
+    def details(self) -> list[SecurityDetails]:
+        """Validated details for all securities, loaded on first access."""
+        if self._details is None:
+            self.load()
+        return self._details  # type: ignore
+
+    @property
+    def version(self) -> int:
+        """Dataset version, incremented every time details are (re)loaded."""
+        if self._details is None:
+            self.load()
+        return self._version
+
+    def load(self) -> None:
+        """Read security details from parquet, validate and build indexes."""
+        details = [SecurityDetails.model_validate(i) for i in pl.read_parquet(self.path).to_dicts()]
+        self._by_id = {i.id: i for i in details}
+        self._by_sedol = {i.sedol: i for i in details}
+        self._details = details
+        self._version += 1
+
+    def get_by_id(self, _id: str) -> SecurityDetails | None:
+        """Get details for a security by id, None if it does not exist."""
+        if not self.is_loaded:
+            self.load()
+        return self._by_id.get(_id)
+
+    def get_by_sedol(self, sedol: str) -> SecurityDetails | None:
+        """Get details for a security by sedol, None if it does not exist."""
+        if not self.is_loaded:
+            self.load()
+        return self._by_sedol.get(sedol)
+
+    def get_invalid_ids(self, ids: list[str]) -> list[str]:
+        """Find ids not present in the registry.
+
+        Parameters
+        ----------
+        ids : list[str]
+            ids to validate
+
+        Returns
+        -------
+        list[str]
+            list of invalid ids
+        """
+        if not self.is_loaded:
+            self.load()
+        return [_id for _id in ids if _id not in self._by_id]
+
+
+returns_store = ReturnsStore(settings.security_returns)
+security_registry = SecurityRegistry(settings.security_details)
 
 
 def load_returns(ids: list[str], start_date: date, end_date: date) -> pl.DataFrame:
@@ -24,12 +367,4 @@ def load_returns(ids: list[str], start_date: date, end_date: date) -> pl.DataFra
     pl.DataFrame
         monthly returns for specified securities and time range
     """
-    security_returns = (
-        pl.scan_parquet(settings.security_returns)
-        .filter(pl.col("id").is_in(ids))
-        .filter(pl.col("date").is_between(start_date, end_date))
-        .collect()
-    )
-    # Pivot table so each security becomes a single column
-    security_returns = security_returns.pivot(on="id", values="monthly_return", index="date")
-    return security_returns
+    return returns_store.get_returns(ids, start_date, end_date)
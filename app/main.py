@@ -1,10 +1,33 @@
 """FastAPI app entrypoint."""
 
-from fastapi import FastAPI
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 
 from app.api.api_router import api_router
 from app.config import settings
+from app.executor import AnalysisQueueFullError, analysis_executor
+from app.loader import returns_store, security_registry
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Load datasets into memory and start analysis workers before serving requests."""
+    returns_store.load()
+    security_registry.load()
+    analysis_executor.start()
+    yield
+    analysis_executor.shutdown()
 
-app = FastAPI(title=settings.title, version=settings.version)
+
+app = FastAPI(title=settings.title, version=settings.version, lifespan=lifespan)
 
 app.include_router(api_router)
+
+
+@app.exception_handler(AnalysisQueueFullError)
+async def analysis_queue_full_handler(request: Request, exc: AnalysisQueueFullError) -> JSONResponse:
+    """Shed load with 503 when analysis workers and their queue are saturated."""
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
@@ -1,8 +1,9 @@
 """Pydantic based schemas for data validation."""
 
 from datetime import date
+from typing import Annotated, Literal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class SecurityDetails(BaseModel):
@@ -31,6 +32,32 @@ class SecurityDetails(BaseModel):
     }
 
 
+class SecurityLookup(BaseModel):
+    """Bulk security lookup by id and / or sedol."""
+
+    ids: list[str] = []
+    sedols: list[str] = []
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "ids": ["vanguard-us-equity-index-fund-gbp-acc"],
+                    "sedols": ["B50MZ94"],
+                }
+            ]
+        }
+    }
+
+
+class SecurityLookupResult(BaseModel):
+    """Bulk security lookup result."""
+
+    securities: list[SecurityDetails]
+    missing_ids: list[str]
+    missing_sedols: list[str]
+
+
 class Holding(BaseModel):
     """Security holding."""
 
@@ -39,11 +66,18 @@ class Holding(BaseModel):
 
 
 class BacktestScenario(BaseModel):
-    """Backtest settings."""
+    """Backtest settings.
+
+    Portfolio is bought and held unless rebalanced back to its initial weights: at calendar period
+    ends (rebalance_frequency), whenever a weight drifts more than rebalance_tolerance from target,
+    or at period ends where drift exceeds the tolerance if both are set.
+    """
 
     portfolio: list[Holding]
     start_date: date
     end_date: date
+    rebalance_frequency: Literal["monthly", "quarterly", "annual"] | None = None
+    rebalance_tolerance: float | None = Field(default=None, gt=0)
 
     model_config = {
         "json_schema_extra": {
@@ -105,13 +139,167 @@ class PortfolioMetrics(BaseModel):
     max_drawdown: float
 
 
+class ExtendedPortfolioMetrics(PortfolioMetrics):
+    """Portfolio metrics with additional risk / return statistics, based on monthly returns."""
+
+    sharpe_ratio: float
+    sortino_ratio: float
+    calmar_ratio: float
+    value_at_risk: float
+    conditional_value_at_risk: float
+    max_drawdown_duration: int
+    best_month: float
+    worst_month: float
+
+
 class BacktestResult(BaseModel):
     """Backtest result."""
 
-    metrics: PortfolioMetrics
+    metrics: ExtendedPortfolioMetrics | PortfolioMetrics
     portfolio_values: list[PortfolioValue]
 
 
+class ColumnarPortfolioValues(BaseModel):
+    """Portfolio values over time stored column wise, holdings are keyed by security id."""
+
+    dates: list[date]
+    portfolio_value: list[float]
+    holdings: dict[str, list[float | None]]
+
+
+class ColumnarBacktestResult(BaseModel):
+    """Backtest result with columnar portfolio values."""
+
+    metrics: ExtendedPortfolioMetrics | PortfolioMetrics
+    portfolio_values: ColumnarPortfolioValues
+
+
+class BatchBacktestScenario(BaseModel):
+    """Batch backtest settings, portfolios share the same date range and rebalancing rules."""
+
+    portfolios: list[list[Holding]]
+    start_date: date
+    end_date: date
+    rebalance_frequency: Literal["monthly", "quarterly", "annual"] | None = None
+    rebalance_tolerance: float | None = Field(default=None, gt=0)
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "portfolios": [
+                        [
+                            {"id": "vanguard-us-equity-index-fund-gbp-acc", "amount": 100.0},
+                            {"id": "vanguard-uk-inflation-linked-gilt-index-fund-gbp-acc", "amount": 100.0},
+                        ],
+                        [
+                            {"id": "vanguard-us-equity-index-fund-gbp-acc", "amount": 150.0},
+                            {"id": "vanguard-uk-inflation-linked-gilt-index-fund-gbp-acc", "amount": 50.0},
+                        ],
+                    ],
+                    "start_date": date(2023, 1, 1).strftime("%Y-%m-%d"),
+                    "end_date": date(2024, 1, 1).strftime("%Y-%m-%d"),
+                }
+            ]
+        }
+    }
+
+
+class BatchPortfolioResult(BaseModel):
+    """Backtest result for a single portfolio in a batch."""
+
+    metrics: ExtendedPortfolioMetrics | PortfolioMetrics
+    portfolio_values: list[float] | None = None
+
+
+class BatchBacktestResult(BaseModel):
+    """Batch backtest result, portfolio values are only included on request."""
+
+    dates: list[date] | None = None
+    results: list[BatchPortfolioResult]
+
+
+class RollingPortfolioMetrics(BaseModel):
+    """Portfolio metrics over a trailing window ending on date."""
+
+    date: date
+    portfolio_return: float
+    standard_deviation: float
+    drawdown: float
+
+
+class RollingBacktestResult(BaseModel):
+    """Rolling window portfolio metrics, window is the number of monthly returns."""
+
+    window: int
+    metrics: list[RollingPortfolioMetrics]
+
+
+class SimulationScenario(BaseModel):
+    """Forward simulation settings, returns between start_date and end_date are used as history.
+
+    Paths are drawn by stationary block bootstrap of historical months (blocks of random length
+    with mean block_size) or from a multivariate normal with the historical mean and risk model.
+    """
+
+    portfolio: list[Holding]
+    start_date: date
+    end_date: date
+    n_paths: int = Field(default=10_000, ge=1, le=100_000)
+    n_months: int = Field(default=120, ge=1, le=240)
+    method: Literal["bootstrap", "normal"] = "bootstrap"
+    block_size: float = Field(default=12.0, ge=1)
+    risk_model: Literal["sample_cov", "ledoit_wolf"] = "sample_cov"
+    percentiles: list[Annotated[float, Field(ge=0, le=100)]] = Field(
+        default=[5.0, 25.0, 50.0, 75.0, 95.0], min_length=1
+    )
+    seed: int | None = None
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "portfolio": [
+                        {"id": "vanguard-us-equity-index-fund-gbp-acc", "amount": 100.0},
+                        {"id": "vanguard-uk-inflation-linked-gilt-index-fund-gbp-acc", "amount": 100.0},
+                    ],
+                    "start_date": date(2014, 1, 1).strftime("%Y-%m-%d"),
+                    "end_date": date(2024, 1, 1).strftime("%Y-%m-%d"),
+                    "n_paths": 10_000,
+                    "n_months": 120,
+                    "method": "bootstrap",
+                    "block_size": 12.0,
+                    "seed": 42,
+                }
+            ]
+        }
+    }
+
+
+class PercentileBand(BaseModel):
+    """Percentile of simulated portfolio value for each month, starting at month 0."""
+
+    percentile: float
+    portfolio_values: list[float]
+
+
+class TerminalValueStatistics(BaseModel):
+    """Distribution of simulated portfolio value at the end of the horizon."""
+
+    mean: float
+    standard_deviation: float
+    min: float
+    max: float
+    probability_of_loss: float
+
+
+class SimulationResult(BaseModel):
+    """Forward simulation result."""
+
+    percentile_bands: list[PercentileBand]
+    terminal_value: TerminalValueStatistics
+
+
 class OptimisationScenario(BaseModel):
     """Optimisation settings."""
 
@@ -135,6 +323,15 @@ class OptimisationScenario(BaseModel):
     }
 
 
+class OptimisationResult(BaseModel):
+    """Optimised weights with solver statistics."""
+
+    weights: list[float]
+    n_iterations: int
+    n_function_evaluations: int
+    n_gradient_evaluations: int
+
+
 class ExpectedReturn(BaseModel):
     """Expected return for a security."""
 
@@ -153,6 +350,15 @@ class ExpectedReturn(BaseModel):
     }
 
 
+class CacheStats(BaseModel):
+    """Cache usage statistics."""
+
+    hits: int
+    misses: int
+    size: int
+    max_size: int
+
+
 class EfficientFrontierPortfolio(BaseModel):
     """Efficient frontier portfolios."""
 
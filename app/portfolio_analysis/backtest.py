@@ -1,14 +1,222 @@
 """Module for backtesting portfolio."""
 
+from typing import Literal
+
+import numpy as np
 import polars as pl
 
-from app.loader import load_returns
-from app.models import BacktestScenario
+from app.loader import returns_store
+from app.models import BacktestScenario, BatchBacktestScenario
+
+
+def get_cumulative_growth(security_returns: np.ndarray) -> np.ndarray:
+    """Calculate growth of one unit invested in each security.
+
+    Parameters
+    ----------
+    security_returns : np.ndarray
+        (T x N) monthly returns, missing returns as nan
+
+    Returns
+    -------
+    np.ndarray
+        (T x N) cumulative growth, return for day 0 is set to 0 and missing returns are treated as 0
+    """
+    growth = np.nan_to_num(security_returns, nan=0.0) + 1.0
+    growth[:1] = 1.0
+    return np.cumprod(growth, axis=0)
+
+
+def get_missing_returns(security_returns: np.ndarray) -> np.ndarray:
+    """Find missing returns after day 0, holdings are not valued in these months."""
+    missing = np.isnan(security_returns)
+    missing[:1] = False
+    return missing
+
+
+def get_holding_values(
+    growth: np.ndarray, missing: np.ndarray, amounts: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Value holdings and portfolio over time for a buy and hold portfolio.
+
+    Parameters
+    ----------
+    growth : np.ndarray
+        (T x N) cumulative growth of each security
+    missing : np.ndarray
+        (T x N) mask of missing returns, holdings are not valued in these months
+    amounts : np.ndarray
+        (N,) initial amount invested in each security
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        (T x N) holding values (nan where returns are missing) and (T,) portfolio value
+    """
+    holding_values = growth * amounts
+    holding_values[missing] = np.nan
+    return holding_values, np.nansum(holding_values, axis=1)
+
+
+def get_portfolio_values(growth: np.ndarray, missing: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+    """Value many buy and hold portfolios over the same securities in one matrix product.
+
+    Parameters
+    ----------
+    growth : np.ndarray
+        (T x N) cumulative growth of each security
+    missing : np.ndarray
+        (T x N) mask of missing returns, holdings are not valued in these months
+    amounts : np.ndarray
+        (N x P) initial amount invested in each security for each portfolio
+
+    Returns
+    -------
+    np.ndarray
+        (T x P) portfolio values
+    """
+    return np.where(missing, 0.0, growth) @ amounts
+
+
+def get_calendar_rebalance_rows(
+    dates: pl.Series, frequency: Literal["monthly", "quarterly", "annual"]
+) -> np.ndarray:
+    """Find months ending a calendar period, holdings are rebalanced after that month's return.
+
+    Parameters
+    ----------
+    dates : pl.Series
+        month end dates
+    frequency : Literal["monthly", "quarterly", "annual"]
+        rebalancing frequency
+
+    Returns
+    -------
+    np.ndarray
+        rebalance rows, day 0 is excluded
+    """
+    months = dates.dt.month().to_numpy()
+    match frequency:
+        case "monthly":
+            due = np.ones(months.shape[0], dtype=bool)
+        case "quarterly":
+            due = months % 3 == 0
+        case "annual":
+            due = months == 12
+    due[:1] = False
+    return np.flatnonzero(due)
+
+
+def get_drift_rebalance_rows(
+    growth: np.ndarray, weights: np.ndarray, tolerance: float, candidate_rows: np.ndarray | None = None
+) -> np.ndarray:
+    """Find months where a weight has drifted more than tolerance away from its target.
+
+    Drift is path dependent, so rebalances are found one at a time, but each search scans all
+    remaining months at once.
+
+    Parameters
+    ----------
+    growth : np.ndarray
+        (T x N) cumulative growth of each security
+    weights : np.ndarray
+        (N,) target weights
+    tolerance : float
+        largest absolute difference between drifted and target weight
+    candidate_rows : np.ndarray | None, optional
+        only rebalance on these rows (e.g. calendar period ends), every month if None, by default None
+
+    Returns
+    -------
+    np.ndarray
+        rebalance rows
+    """
+    candidates = np.arange(1, growth.shape[0]) if candidate_rows is None else candidate_rows
+    rows = []
+    last_rebalance = 0
+    while (candidates := candidates[candidates > last_rebalance]).shape[0]:
+        drifted_weights = growth[candidates] / growth[last_rebalance] * weights
+        drifted_weights /= drifted_weights.sum(axis=1, keepdims=True)
+        breached = np.abs(drifted_weights - weights).max(axis=1) > tolerance
+        if not breached.any():
+            break
+        last_rebalance = int(candidates[np.argmax(breached)])
+        rows.append(last_rebalance)
+    return np.array(rows, dtype=np.intp)
+
+
+def get_rebalance_rows(
+    dates: pl.Series,
+    growth: np.ndarray,
+    weights: np.ndarray,
+    frequency: Literal["monthly", "quarterly", "annual"] | None,
+    tolerance: float | None,
+) -> np.ndarray:
+    """Find rebalance months from calendar and / or drift triggers.
+
+    Parameters
+    ----------
+    dates : pl.Series
+        month end dates
+    growth : np.ndarray
+        (T x N) cumulative growth of each security
+    weights : np.ndarray
+        (N,) target weights
+    frequency : Literal["monthly", "quarterly", "annual"] | None
+        calendar rebalancing frequency
+    tolerance : float | None
+        drift tolerance band, checked at calendar period ends if frequency is set
+
+    Returns
+    -------
+    np.ndarray
+        rebalance rows
+    """
+    calendar_rows = None if frequency is None else get_calendar_rebalance_rows(dates, frequency)
+    if tolerance is not None:
+        return get_drift_rebalance_rows(growth, weights, tolerance, calendar_rows)
+    return np.array([], dtype=np.intp) if calendar_rows is None else calendar_rows
+
+
+def get_segment_growth(
+    growth: np.ndarray, amounts: np.ndarray, rebalance_rows: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Split growth into segments between rebalances sharing the same rebalance schedule.
+
+    Within a segment holdings are bought and held, so values are the weights scaled by growth since
+    the last rebalance. Portfolio value at each rebalance is a cumulative product over segments.
+
+    Parameters
+    ----------
+    growth : np.ndarray
+        (T x N) cumulative growth of each security
+    amounts : np.ndarray
+        (N x P) initial amount invested in each security for each portfolio
+    rebalance_rows : np.ndarray
+        rows after which holdings are reset to initial weights
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, np.ndarray]
+        (T x N) growth since last rebalance, (N x P) target weights and
+        (T x P) portfolio value at last rebalance
+    """
+    totals = amounts.sum(axis=0)
+    weights = amounts / totals
+    bases = np.concatenate([[0], rebalance_rows]).astype(np.intp)
+    segments = np.searchsorted(bases, np.arange(growth.shape[0]), side="right") - 1
+    segment_growth = (growth[bases[1:]] / growth[bases[:-1]]) @ weights
+    rebalance_values = totals * np.concatenate(
+        [np.ones((1, totals.shape[0])), np.cumprod(segment_growth, axis=0)]
+    )
+    return growth / growth[bases[segments]], weights, rebalance_values[segments]
 
 
 def backtest(backtest_scenario: BacktestScenario) -> pl.DataFrame:
     """Run backtest on porfolio.
 
+    Holdings are shown after rebalancing in months where the portfolio is rebalanced.
+
     Parameters
     ----------
     backtest_scenario : BacktestScenario
@@ -19,25 +227,92 @@ def backtest(backtest_scenario: BacktestScenario) -> pl.DataFrame:
     pl.DataFrame
         Dataframe with individual securities and portfolio value per month.
     """
-    ids = [i.id for i in backtest_scenario.portfolio]
-    security_returns = load_returns(ids, backtest_scenario.start_date, backtest_scenario.end_date)
-    # Set return for day 0 to 0.
-    security_returns = security_returns.with_columns(
+    # Holdings of the same security are combined
+    amounts: dict[str, float] = {}
+    for holding in backtest_scenario.portfolio:
+        amounts[holding.id] = amounts.get(holding.id, 0.0) + holding.amount
+    ids = list(amounts)
+    dates, growth, missing = returns_store.get_cumulative_growth(
+        ids, backtest_scenario.start_date, backtest_scenario.end_date
+    )
+
+    _amounts = np.fromiter(amounts.values(), dtype=np.float64)
+    if (
+        backtest_scenario.rebalance_frequency is not None
+        or backtest_scenario.rebalance_tolerance is not None
+    ):
+        rebalance_rows = get_rebalance_rows(
+            dates,
+            growth,
+            _amounts / _amounts.sum(),
+            backtest_scenario.rebalance_frequency,
+            backtest_scenario.rebalance_tolerance,
+        )
+        relative_growth, weights, rebalance_values = get_segment_growth(
+            growth, _amounts[:, None], rebalance_rows
+        )
+        holding_values, portfolio_value = get_holding_values(
+            relative_growth * rebalance_values, missing, weights[:, 0]
+        )
+    else:
+        holding_values, portfolio_value = get_holding_values(growth, missing, _amounts)
+    return pl.DataFrame(
         [
-            pl.when(pl.col("date") == pl.col("date").min()).then(0).otherwise(pl.col(_id)).alias(_id)
-            for _id in ids
+            dates,
+            *(pl.Series(_id, holding_values[:, i], nan_to_null=True) for i, _id in enumerate(ids)),
+            pl.Series("portfolio_value", portfolio_value),
         ]
     )
-    # Calculate monthly returns
-    security_returns = security_returns.with_columns(
-        [(pl.col(_id) + 1.0).cum_prod().alias(_id) - 1.0 for _id in ids]
+
+
+def batch_backtest(batch_scenario: BatchBacktestScenario) -> tuple[pl.Series, np.ndarray]:
+    """Run backtest on many portfolios sharing the same date range.
+
+    Parameters
+    ----------
+    batch_scenario : BatchBacktestScenario
+        Batch backtest settings
+
+    Returns
+    -------
+    tuple[pl.Series, np.ndarray]
+        dates and (T x P) portfolio value per month for each portfolio
+    """
+    ids = list(
+        dict.fromkeys(holding.id for portfolio in batch_scenario.portfolios for holding in portfolio)
     )
-    security_returns = security_returns.with_columns(
-        [
-            ((pl.col(holding.id) + 1.0) * holding.amount).alias(holding.id)
-            for holding in backtest_scenario.portfolio
-        ]
+    id_index = {_id: i for i, _id in enumerate(ids)}
+    amounts = np.zeros((len(ids), len(batch_scenario.portfolios)))
+    for j, portfolio in enumerate(batch_scenario.portfolios):
+        for holding in portfolio:
+            amounts[id_index[holding.id], j] += holding.amount
+
+    dates, growth, missing = returns_store.get_cumulative_growth(
+        ids, batch_scenario.start_date, batch_scenario.end_date
     )
-    # Sum each holding to get monthly portfolio value
-    security_returns = security_returns.with_columns(pl.sum_horizontal(ids).alias("portfolio_value"))
-    return security_returns
+    frequency, tolerance = batch_scenario.rebalance_frequency, batch_scenario.rebalance_tolerance
+    if frequency is None and tolerance is None:
+        return dates, get_portfolio_values(growth, missing, amounts)
+
+    if tolerance is None and frequency is not None:
+        # Calendar schedule is shared, so all portfolios are valued together
+        schedules = [(slice(None), get_calendar_rebalance_rows(dates, frequency))]
+    else:
+        schedules = [
+            (
+                slice(j, j + 1),
+                get_rebalance_rows(
+                    dates, growth, amounts[:, j] / amounts[:, j].sum(), frequency, tolerance
+                ),
+            )
+            for j in range(amounts.shape[1])
+        ]
+    portfolio_values = np.empty((growth.shape[0], amounts.shape[1]))
+    for portfolios, rebalance_rows in schedules:
+        relative_growth, weights, rebalance_values = get_segment_growth(
+            growth, amounts[:, portfolios], rebalance_rows
+        )
+        portfolio_values[:, portfolios] = (
+            get_portfolio_values(relative_growth, missing, weights) * rebalance_values
+        )
+    return dates, portfolio_values
@@ -0,0 +1,196 @@
+"""Module for tracing the efficient frontier with the critical line algorithm."""
+
+import numpy as np
+
+
+def _get_free_weights(
+    covariance: np.ndarray, expected_returns: np.ndarray, weights: np.ndarray, free: list[int]
+) -> tuple[np.ndarray, np.ndarray]:
+    """Free weights as a linear function of lambda, w_free = a + lambda * b.
+
+    Minimises 1/2 w'Σw - lambda μ'w subject to weights summing to 1, with bounded weights fixed.
+
+    Parameters
+    ----------
+    covariance : np.ndarray
+        covariance matrix
+    expected_returns : np.ndarray
+        expected returns
+    weights : np.ndarray
+        current weights, only bounded weights are used
+    free : list[int]
+        indices of free weights
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        intercept a and slope b of free weights in lambda
+    """
+    bounded = [i for i in range(expected_returns.shape[0]) if i not in free]
+    covariance_free_inv = np.linalg.inv(covariance[np.ix_(free, free)])
+    u = covariance_free_inv.sum(axis=1)
+    v = covariance_free_inv @ expected_returns[free]
+    h = covariance_free_inv @ covariance[np.ix_(free, bounded)] @ weights[bounded]
+    a = -h + (1 - weights[bounded].sum() + h.sum()) / u.sum() * u
+    b = v - v.sum() / u.sum() * u
+    return a, b
+
+
+def get_corner_portfolios(
+    expected_returns: np.ndarray,
+    covariance: np.ndarray,
+    lower_bounds: np.ndarray | None = None,
+    upper_bounds: np.ndarray | None = None,
+    tol: float = 1e-10,
+) -> np.ndarray:
+    """Find corner portfolios of the efficient frontier with the critical line algorithm.
+
+    Between two adjacent corner portfolios, weights are linear in expected return, so any
+    point on the fully invested efficient frontier is an interpolation of two corners.
+
+    Parameters
+    ----------
+    expected_returns : np.ndarray
+        expected returns for securities
+    covariance : np.ndarray
+        risk model (typically covariance) for securities
+    lower_bounds : np.ndarray | None, optional
+        lower bound for each weight, 0 if None, by default None
+    upper_bounds : np.ndarray | None, optional
+        upper bound for each weight, 1 if None, by default None
+    tol : float, optional
+        numerical tolerance for bounds and lambda, by default 1e-10
+
+    Returns
+    -------
+    np.ndarray
+        (K x N) corner portfolio weights from maximum return to minimum variance
+    """
+    expected_returns = np.ravel(expected_returns).astype(np.float64)
+    n_securities = expected_returns.shape[0]
+    lower_bounds = np.zeros(n_securities) if lower_bounds is None else np.asarray(lower_bounds, np.float64)
+    upper_bounds = np.ones(n_securities) if upper_bounds is None else np.asarray(upper_bounds, np.float64)
+
+    # Start at maximum return portfolio, fill securities with highest return until fully invested
+    weights = lower_bounds.copy()
+    free: list[int] = []
+    for i in np.argsort(-expected_returns, kind="stable"):
+        weights[i] = min(upper_bounds[i], 1 - (weights.sum() - weights[i]))
+        if weights.sum() >= 1 - tol:
+            free = [int(i)]
+            break
+    corners = [weights.copy()]
+    current_lambda = np.inf
+
+    while True:
+        # Case a: a free weight hits one of its bounds
+        lambda_in, i_in, bound_in = -np.inf, -1, 0.0
+        if len(free) > 1:
+            a, b = _get_free_weights(covariance, expected_returns, weights, free)
+            for j, i in enumerate(free):
+                if abs(b[j]) < tol:
+                    continue
+                bound = upper_bounds[i] if b[j] < 0 else lower_bounds[i]
+                _lambda = (bound - a[j]) / b[j]
+                if _lambda < current_lambda - tol and _lambda > lambda_in:
+                    lambda_in, i_in, bound_in = _lambda, i, bound
+
+        # Case b: a bounded weight becomes free
+        lambda_out, i_out = -np.inf, -1
+        for i in (i for i in range(n_securities) if i not in free):
+            a, b = _get_free_weights(covariance, expected_returns, weights, [*free, i])
+            if abs(b[-1]) < tol:
+                continue
+            _lambda = (weights[i] - a[-1]) / b[-1]
+            if _lambda < current_lambda - tol and _lambda > lambda_out:
+                lambda_out, i_out = _lambda, i
+
+        if lambda_in <= 0 and lambda_out <= 0:
+            # Minimum variance portfolio
+            current_lambda = 0.0
+        elif lambda_in > lambda_out:
+            current_lambda = lambda_in
+            free.remove(i_in)
+            weights[i_in] = bound_in
+        else:
+            current_lambda = lambda_out
+            free.append(i_out)
+
+        a, b = _get_free_weights(covariance, expected_returns, weights, free)
+        weights[free] = a + current_lambda * b
+        corners.append(weights.copy())
+        if current_lambda == 0:
+            break
+
+    _corners = np.clip(np.array(corners), lower_bounds, upper_bounds)
+    # Drop corners that do not lower expected return, e.g. from ties or numerical error
+    corner_returns = _corners @ expected_returns
+    keep = np.concatenate([[True], np.diff(corner_returns) < -tol])
+    return _corners[keep]
+
+
+def get_frontier_weights(
+    expected_returns: np.ndarray, corner_portfolios: np.ndarray, target_returns: np.ndarray
+) -> np.ndarray:
+    """Interpolate frontier portfolios for target returns between adjacent corner portfolios.
+
+    Parameters
+    ----------
+    expected_returns : np.ndarray
+        expected returns for securities
+    corner_portfolios : np.ndarray
+        (K x N) corner portfolio weights ordered by expected return
+    target_returns : np.ndarray
+        (P,) target returns within the range of the corner portfolios
+
+    Returns
+    -------
+    np.ndarray
+        (P x N) frontier portfolio weights
+    """
+    corner_returns = corner_portfolios @ np.ravel(expected_returns)
+    if corner_returns[0] > corner_returns[-1]:
+        corner_portfolios, corner_returns = corner_portfolios[::-1], corner_returns[::-1]
+    if corner_returns.shape[0] == 1:
+        return np.repeat(corner_portfolios, len(target_returns), axis=0)
+    target_returns = np.clip(target_returns, corner_returns[0], corner_returns[-1])
+    segment = np.clip(np.searchsorted(corner_returns, target_returns) - 1, 0, corner_returns.shape[0] - 2)
+    ratio = (target_returns - corner_returns[segment]) / (
+        corner_returns[segment + 1] - corner_returns[segment]
+    )
+    return corner_portfolios[segment] + ratio[:, None] * (
+        corner_portfolios[segment + 1] - corner_portfolios[segment]
+    )
+
+
+def get_critical_line_frontier(
+    expected_returns: np.ndarray, covariance: np.ndarray, n_portfolios: int
+) -> tuple[np.ndarray, np.ndarray, int]:
+    """Minimum variance portfolios for evenly spaced target returns, long only and fully invested.
+
+    Targets span lowest to highest expected return like the SLSQP frontier. Below the minimum
+    variance portfolio this is the (inefficient) lower branch, traced by running the critical line
+    algorithm on negated expected returns.
+
+    Parameters
+    ----------
+    expected_returns : np.ndarray
+        expected returns for securities
+    covariance : np.ndarray
+        risk model (typically covariance) for securities
+    n_portfolios : int
+        number of portfolios on the frontier
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, int]
+        target returns, (P x N) portfolio weights and number of corner portfolios
+    """
+    expected_returns = np.ravel(expected_returns)
+    upper_corners = get_corner_portfolios(expected_returns, covariance)
+    lower_corners = get_corner_portfolios(-expected_returns, covariance)
+    # Lower branch ascending to minimum variance, then upper branch ascending to maximum return
+    corner_portfolios = np.concatenate([lower_corners, upper_corners[-2::-1]])
+    target_returns = np.linspace(expected_returns.min(), expected_returns.max(), n_portfolios)
+    weights = get_frontier_weights(expected_returns, corner_portfolios, target_returns)
+    return target_returns, weights, corner_portfolios.shape[0]
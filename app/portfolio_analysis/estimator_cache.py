@@ -0,0 +1,203 @@
+"""Module for caching expected returns and risk models between requests."""
+
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from datetime import date
+from typing import Literal
+
+import numpy as np
+import polars as pl
+
+from app.config import settings
+from app.executor import analysis_executor
+from app.loader import load_returns, returns_store
+from app.models import CacheStats
+from app.portfolio_analysis.expected_returns import get_log_expected_returns
+from app.portfolio_analysis.risk_models import (
+    get_leodit_wolf_covariance,
+    get_moment_sample_covariance,
+    get_sample_covariance,
+)
+
+
+class EstimatorCache:
+    """Thread safe, bounded cache evicting the least recently used estimate."""
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict[Hashable, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        """Get cached estimate, computing and storing it on a miss.
+
+        Parameters
+        ----------
+        key : Hashable
+            cache key
+        compute : Callable[[], np.ndarray]
+            function to compute the estimate
+
+        Returns
+        -------
+        np.ndarray
+            read only estimate
+        """
+        with self._lock:
+            if key in self._cache:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            self.misses += 1
+        value = compute()
+        value.flags.writeable = False
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        """Remove all estimates and reset counters."""
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> CacheStats:
+        """Cache usage statistics."""
+        with self._lock:
+            return CacheStats(
+                hits=self.hits, misses=self.misses, size=len(self._cache), max_size=self.max_size
+            )
+
+
+estimator_cache = EstimatorCache(settings.estimator_cache_size)
+
+
+def _get_sorted_ids(ids: list[str]) -> tuple[tuple[str, ...], np.ndarray]:
+    """Sort unique ids for cache keys and find positions of requested ids in sorted order."""
+    sorted_ids = tuple(sorted(set(ids)))
+    positions = {_id: i for i, _id in enumerate(sorted_ids)}
+    return sorted_ids, np.array([positions[_id] for _id in ids], dtype=np.intp)
+
+
+def get_cached_expected_returns(
+    ids: list[str], start_date: date, end_date: date, frequency: int = 12
+) -> np.ndarray:
+    """Get historical expected returns, reusing estimates for the same securities and dates.
+
+    Parameters
+    ----------
+    ids : list[str]
+        securities to calculate expected returns for
+    start_date : date
+        start date
+    end_date : date
+        end date
+    frequency : int, optional
+        number of points per year (252 - daily, 12 - monthly, 1 - yearly), by default 12
+
+    Returns
+    -------
+    np.ndarray
+        (N,) expected return per security, in order of ids
+    """
+    sorted_ids, positions = _get_sorted_ids(ids)
+
+    def compute() -> np.ndarray:
+        n_obs, log_returns = returns_store.get_window_log_returns(list(sorted_ids), start_date, end_date)
+        return get_log_expected_returns(n_obs, log_returns, frequency)
+
+    key = ("expected_returns", sorted_ids, start_date, end_date, frequency, returns_store.version)
+    return estimator_cache.get_or_compute(key, compute)[positions]
+
+
+def compute_risk_model(
+    ids: tuple[str, ...],
+    start_date: date,
+    end_date: date,
+    method: Literal["sample_cov", "ledoit_wolf"],
+    frequency: int = 12,
+) -> np.ndarray:
+    """Compute risk model from returns, run in an analysis worker on a cache miss.
+
+    Parameters
+    ----------
+    ids : tuple[str, ...]
+        securities to calculate risk model for
+    start_date : date
+        start date
+    end_date : date
+        end date
+    method : Literal["sample_cov", "ledoit_wolf"]
+        - sample_cov: sample covariance
+        - leodit_wolf: leodit wolf shrink covariance
+    frequency : int, optional
+        number of points per year (252 - daily, 12 - monthly, 1 - yearly), by default 12
+
+    Returns
+    -------
+    np.ndarray
+        (N x N) covariance matrix, in order of ids
+    """
+    if method == "sample_cov" and settings.prefix_covariance:
+        window_moments = returns_store.get_window_moments(list(ids), start_date, end_date)
+        if window_moments is not None and window_moments[0] > 1:
+            return get_moment_sample_covariance(*window_moments, frequency=frequency)
+    security_returns = load_returns(list(ids), start_date, end_date)
+    _security_returns = security_returns.select(pl.col(ids)).to_numpy()
+    match method:
+        case "sample_cov":
+            covariance = get_sample_covariance(_security_returns, frequency)
+        case "ledoit_wolf":
+            covariance = get_leodit_wolf_covariance(_security_returns)
+    return np.atleast_2d(covariance)
+
+
+def get_cached_risk_model(
+    ids: list[str],
+    start_date: date,
+    end_date: date,
+    method: Literal["sample_cov", "ledoit_wolf"],
+    frequency: int = 12,
+) -> np.ndarray:
+    """Get risk model, reusing estimates for the same securities, dates and method.
+
+    Parameters
+    ----------
+    ids : list[str]
+        securities to calculate risk model for
+    start_date : date
+        start date
+    end_date : date
+        end date
+    method : Literal["sample_cov", "ledoit_wolf"]
+        - sample_cov: sample covariance
+        - leodit_wolf: leodit wolf shrink covariance
+    frequency : int, optional
+        number of points per year (252 - daily, 12 - monthly, 1 - yearly), by default 12
+
+    Returns
+    -------
+    np.ndarray
+        (N x N) covariance matrix, in order of ids
+
+    Notes
+    -----
+    With settings.prefix_covariance, sample covariance for securities with a full history over the
+    date range is assembled from prefix sums held by the returns store instead of a pass over returns.
+    """
+    sorted_ids, positions = _get_sorted_ids(ids)
+
+    def compute() -> np.ndarray:
+        return analysis_executor.run(
+            compute_risk_model, sorted_ids, start_date, end_date, method, frequency
+        )
+
+    key = ("risk_model", sorted_ids, start_date, end_date, method, frequency, returns_store.version)
+    return estimator_cache.get_or_compute(key, compute)[np.ix_(positions, positions)]
@@ -1,5 +1,6 @@
 """Module for calculating expected returns."""
 
+import numpy as np
 import polars as pl
 
 
@@ -29,3 +30,26 @@ def get_historical_expected_returns(df: pl.DataFrame, ids: list[str], frequency:
         .with_columns([(pl.col(id) ** (inv_years) - 1) for id in ids])
     )
     return expected_returns
+
+
+def get_log_expected_returns(n_obs: int, log_returns: np.ndarray, frequency: int = 12) -> np.ndarray:
+    """Calculate historical expected returns from compounded log returns.
+
+    Geometric Mean = exp(sum(log(1 + r)) / n) - 1, equivalent to get_historical_expected_returns
+    without the risk of the product under / overflowing on long histories.
+
+    Parameters
+    ----------
+    n_obs : int
+        number of observations
+    log_returns : np.ndarray
+        (N,) sum of log(1 + r) per security
+    frequency : int, optional
+        number of points per year (252 - daily, 12 - monthly, 1 - yearly), by default 12
+
+    Returns
+    -------
+    np.ndarray
+        (N,) expected return per security
+    """
+    return np.expm1(log_returns * frequency / n_obs)
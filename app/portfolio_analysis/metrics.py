@@ -5,7 +5,7 @@ from datetime import date
 import numpy as np
 import polars as pl
 
-from app.models import PortfolioMetrics
+from app.models import ExtendedPortfolioMetrics, PortfolioMetrics
 
 
 def _diff_in_months(start_date: date, end_date: date) -> int:
@@ -114,8 +114,148 @@ def get_portfolio_std(weights: np.ndarray, covariance: np.ndarray) -> float:
     return float(std)
 
 
+def get_portfolio_std_gradient(weights: np.ndarray, covariance: np.ndarray) -> np.ndarray:
+    """Gradient of portfolio standard deviation with respect to weights.
+
+    d(sqrt(w'Σw))/dw = Σw / sqrt(w'Σw)
+
+    Parameters
+    ----------
+    weights : np.ndarray
+        portfolio weights
+    covariance : np.ndarray
+        covariance matrix / risk model
+
+    Returns
+    -------
+    np.ndarray
+        gradient of portfolio standard deviation
+    """
+    weights = np.array(weights)
+    marginal_variance = np.dot(covariance, weights)
+    std = np.sqrt(np.dot(weights.T, marginal_variance))
+    if std == 0:
+        return np.zeros_like(marginal_variance)
+    return marginal_variance / std
+
+
+def get_metrics_arrays(
+    portfolio_values: np.ndarray,
+    start_date: date,
+    end_date: date,
+    extended: bool = False,
+    risk_free_rate: float = 0.0,
+    confidence: float = 0.95,
+) -> dict[str, np.ndarray]:
+    """Calculate common portfolio metrics for many portfolios at once.
+
+    Total return, CAGR, standard deviation of monthly returns and max drawdown (from a running
+    maximum) are computed with vectorised passes over the value matrix. Extended metrics reuse the
+    same monthly returns and running maximum, Sharpe and Sortino ratios are annualised.
+
+    Parameters
+    ----------
+    portfolio_values : np.ndarray
+        (T x P) portfolio values over time, one column per portfolio
+    start_date : date
+        start date
+    end_date : date
+        end date
+    extended : bool, optional
+        also calculate ExtendedPortfolioMetrics fields, by default False
+    risk_free_rate : float, optional
+        annual risk free rate for Sharpe and Sortino ratios, by default 0.0
+    confidence : float, optional
+        confidence level for monthly value at risk, by default 0.95
+
+    Returns
+    -------
+    dict[str, np.ndarray]
+        (P,) array for each PortfolioMetrics (or ExtendedPortfolioMetrics) field
+    """
+    portfolio_values = np.asarray(portfolio_values, dtype=np.float64)
+    if portfolio_values.ndim == 1:
+        portfolio_values = portfolio_values[:, None]
+    n_years = _diff_in_months(start_date, end_date) / 12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = portfolio_values[-1] / portfolio_values[0]
+        monthly_returns = portfolio_values[1:] / portfolio_values[:-1] - 1
+        running_max = np.maximum.accumulate(portfolio_values, axis=0)
+        metrics = {
+            "portfolio_return": growth - 1,
+            "cagr": growth ** (1 / n_years) - 1,
+            "standard_deviation": monthly_returns.std(axis=0, ddof=1),
+            "max_drawdown": ((running_max - portfolio_values) / running_max).max(axis=0),
+        }
+        if not extended:
+            return metrics
+
+        if monthly_returns.shape[0] == 0:
+            monthly_returns = np.full((1, portfolio_values.shape[1]), np.nan)
+        excess_returns = monthly_returns - risk_free_rate / 12
+        mean_excess_return = excess_returns.mean(axis=0)
+        downside_deviation = np.sqrt((np.minimum(excess_returns, 0.0) ** 2).mean(axis=0))
+        value_at_risk = np.quantile(monthly_returns, 1 - confidence, axis=0)
+        tail_returns = np.where(monthly_returns <= value_at_risk, monthly_returns, np.nan)
+        # Length of the current run below the running maximum, reset whenever a new high is reached
+        under_water = np.cumsum(portfolio_values < running_max, axis=0)
+        drawdown_duration = under_water - np.maximum.accumulate(
+            np.where(portfolio_values < running_max, 0, under_water), axis=0
+        )
+        metrics |= {
+            "sharpe_ratio": mean_excess_return / metrics["standard_deviation"] * np.sqrt(12),
+            "sortino_ratio": mean_excess_return / downside_deviation * np.sqrt(12),
+            "calmar_ratio": metrics["cagr"] / metrics["max_drawdown"],
+            "value_at_risk": -value_at_risk,
+            "conditional_value_at_risk": -np.nanmean(tail_returns, axis=0),
+            "max_drawdown_duration": drawdown_duration.max(axis=0),
+            "best_month": monthly_returns.max(axis=0),
+            "worst_month": monthly_returns.min(axis=0),
+        }
+    return metrics
+
+
+def get_portfolio_metrics_batch(
+    portfolio_values: np.ndarray,
+    start_date: date,
+    end_date: date,
+    extended: bool = False,
+    risk_free_rate: float = 0.0,
+) -> list[PortfolioMetrics]:
+    """Calculate common portfolio metrics for many portfolios at once.
+
+    Parameters
+    ----------
+    portfolio_values : np.ndarray
+        (T x P) portfolio values over time, one column per portfolio
+    start_date : date
+        start date
+    end_date : date
+        end date
+    extended : bool, optional
+        return ExtendedPortfolioMetrics, by default False
+    risk_free_rate : float, optional
+        annual risk free rate for Sharpe and Sortino ratios, by default 0.0
+
+    Returns
+    -------
+    list[PortfolioMetrics]
+        Common portfolio metrics for each portfolio
+    """
+    metrics = get_metrics_arrays(portfolio_values, start_date, end_date, extended, risk_free_rate)
+    n_portfolios = next(iter(metrics.values())).shape[0]
+    model = ExtendedPortfolioMetrics if extended else PortfolioMetrics
+    return [
+        model(**{name: values[i].item() for name, values in metrics.items()}) for i in range(n_portfolios)
+    ]
+
+
 def get_portfolio_metrics(
-    portfolio_values: pl.DataFrame, start_date: date, end_date: date
+    portfolio_values: pl.DataFrame,
+    start_date: date,
+    end_date: date,
+    extended: bool = False,
+    risk_free_rate: float = 0.0,
 ) -> PortfolioMetrics:
     """Calculate common portfolio metrics.
 
@@ -127,21 +267,16 @@ def get_portfolio_metrics(
         start date
     end_date : date
         end date
+    extended : bool, optional
+        return ExtendedPortfolioMetrics, by default False
+    risk_free_rate : float, optional
+        annual risk free rate for Sharpe and Sortino ratios, by default 0.0
 
     Returns
     -------
     PortfolioMetrics
         Common portfolio metrics
     """
-    portfolio_values = portfolio_values.with_columns(
-        (pl.col("portfolio_value") / pl.col("portfolio_value").shift() - 1).alias("portfolio_return")
-    )
-    start_value = portfolio_values["portfolio_value"].head(1)[0]
-    end_value = portfolio_values["portfolio_value"].tail(1)[0]
-
-    return PortfolioMetrics(
-        portfolio_return=get_portfolio_return(start_value, end_value),
-        cagr=get_cagr(start_value, end_value, start_date, end_date),
-        standard_deviation=portfolio_values["portfolio_return"].std(),  # type: ignore
-        max_drawdown=get_max_drawdown(portfolio_values.select("portfolio_value")),
-    )
+    return get_portfolio_metrics_batch(
+        portfolio_values["portfolio_value"].to_numpy(), start_date, end_date, extended, risk_free_rate
+    )[0]
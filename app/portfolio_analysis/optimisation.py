@@ -1,12 +1,15 @@
 """Module to run optimisation."""
 
 from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache
 from typing import Any
 
 import numpy as np
 from scipy.optimize import minimize
 
-from app.portfolio_analysis.metrics import get_portfolio_std
+from app.models import OptimisationResult
+from app.portfolio_analysis.metrics import get_portfolio_std, get_portfolio_std_gradient
 
 
 def optimise(
@@ -15,7 +18,9 @@ def optimise(
     bounds: tuple[tuple[float, float], ...],
     constraints: tuple[Any, ...],
     initial_weights: np.ndarray,
-) -> list[float]:
+    jac: Callable[..., np.ndarray] | None = None,
+    tol: float = 1e-10,
+) -> OptimisationResult:
     """Small wrapper over scipy minimize.
 
     Parameters
@@ -30,27 +35,79 @@ def optimise(
         constraints for optimisation.
     initial_weights : np.ndarray
         initial weights for optimisation
+    jac : Callable[..., np.ndarray] | None, optional
+        gradient of loss function, finite differences are used if None, by default None
+    tol : float, optional
+        tolerance for termination, tight enough that warm / cold starts reach the same optimum,
+        by default 1e-10
 
     Returns
     -------
-    list[float]
-        optimised weights
+    OptimisationResult
+        optimised weights and solver statistics
     """
-    _result: list[float] = minimize(
+    _result = minimize(
         func,
         initial_weights,
         args=args,
         method="SLSQP",
+        jac=jac,
         bounds=bounds,
         constraints=constraints,  # Typing this is a nightmare
-    ).x.tolist()
+        tol=tol,
+    )
+    return OptimisationResult(
+        weights=_result.x.tolist(),
+        n_iterations=_result.nit,
+        n_function_evaluations=_result.nfev,
+        n_gradient_evaluations=_result.njev,
+    )
 
-    return _result
+
+def get_budget_constraint() -> dict[str, Any]:
+    """Equality constraint for fully invested portfolio, weights sum to 1.
+
+    Returns
+    -------
+    dict[str, Any]
+        scipy constraint with jacobian
+    """
+    return {
+        "type": "eq",
+        "fun": lambda x: np.sum(x) - 1,
+        "jac": lambda x: np.ones_like(x),
+    }
+
+
+def get_target_return_constraint(expected_returns: np.ndarray, target_return: float) -> dict[str, Any]:
+    """Equality constraint for portfolio expected return to equal a target.
+
+    Parameters
+    ----------
+    expected_returns : np.ndarray
+        expected returns for securities
+    target_return : float
+        target portfolio return
+
+    Returns
+    -------
+    dict[str, Any]
+        scipy constraint with jacobian
+    """
+    _expected_returns = np.ravel(expected_returns)
+    return {
+        "type": "eq",
+        "fun": lambda x: np.dot(_expected_returns, x) - target_return,
+        "jac": lambda x: _expected_returns,
+    }
 
 
 def get_min_vol_portfolio(
-    expected_returns: np.ndarray, risk_model: np.ndarray, constraints: tuple[Any, ...]
-) -> list[float]:
+    expected_returns: np.ndarray,
+    risk_model: np.ndarray,
+    constraints: tuple[Any, ...],
+    initial_weights: np.ndarray | None = None,
+) -> OptimisationResult:
     """Use optimisation to find portfolio with minimum std for a given return.
 
     Parameters
@@ -61,14 +118,123 @@ def get_min_vol_portfolio(
         risk model (typically covariance) for securities
     constraints : tuple[Any, ...]
         constraints for portfolio weights (e.g. sum to 1)
+    initial_weights : np.ndarray | None, optional
+        starting point for optimisation, equal weights if None, by default None
 
     Returns
     -------
-    list[float]
-        _description_
+    OptimisationResult
+        minimum volatility weights and solver statistics
     """
     n_securities = expected_returns.shape[0]
-    initial_weights = np.repeat(1.0 / n_securities, n_securities)
+    if initial_weights is None:
+        initial_weights = np.repeat(1.0 / n_securities, n_securities)
     bounds = tuple((0.0, 1.0) for i in np.nditer(expected_returns))
-    _result = optimise(get_portfolio_std, risk_model, bounds, constraints, initial_weights)
+    _result = optimise(
+        get_portfolio_std, risk_model, bounds, constraints, initial_weights, jac=get_portfolio_std_gradient
+    )
     return _result
+
+
+def get_mean_variance_portfolio(expected_returns: np.ndarray, risk_model: np.ndarray) -> OptimisationResult:
+    """Find fully invested, long only portfolio with minimum volatility.
+
+    Parameters
+    ----------
+    expected_returns : np.ndarray
+        expected returns for securities
+    risk_model : np.ndarray
+        risk model (typically covariance) for securities
+
+    Returns
+    -------
+    OptimisationResult
+        minimum volatility weights and solver statistics
+    """
+    return get_min_vol_portfolio(expected_returns, risk_model, (get_budget_constraint(),))
+
+
+def _solve_frontier_segment(
+    expected_returns: np.ndarray, risk_model: np.ndarray, target_returns: np.ndarray
+) -> list[OptimisationResult]:
+    """Solve consecutive frontier points, warm starting each from the previous optimum.
+
+    Parameters
+    ----------
+    expected_returns : np.ndarray
+        expected returns for securities
+    risk_model : np.ndarray
+        risk model (typically covariance) for securities
+    target_returns : np.ndarray
+        ascending target returns to solve for
+
+    Returns
+    -------
+    list[OptimisationResult]
+        minimum volatility portfolio for each target return
+    """
+    results: list[OptimisationResult] = []
+    initial_weights = None
+    for target_return in target_returns:
+        constraints = (
+            get_target_return_constraint(expected_returns, target_return),
+            get_budget_constraint(),
+        )
+        result = get_min_vol_portfolio(expected_returns, risk_model, constraints, initial_weights)
+        initial_weights = np.array(result.weights)
+        results.append(result)
+    return results
+
+
+@cache
+def _get_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Process pool shared across requests, created on first use."""
+    return ProcessPoolExecutor(max_workers=max_workers)
+
+
+def get_efficient_frontier(
+    expected_returns: np.ndarray,
+    risk_model: np.ndarray,
+    n_portfolios: int,
+    max_workers: int = 1,
+    segment_size: int = 25,
+) -> tuple[np.ndarray, list[OptimisationResult]]:
+    """Find minimum volatility portfolios for evenly spaced target returns.
+
+    Target returns are split into contiguous segments, each solved sequentially with warm starts.
+    Segments are independent so are solved across a process pool when max_workers > 1.
+
+    Parameters
+    ----------
+    expected_returns : np.ndarray
+        expected returns for securities
+    risk_model : np.ndarray
+        risk model (typically covariance) for securities
+    n_portfolios : int
+        number of portfolios on the frontier
+    max_workers : int, optional
+        number of processes to solve segments in, by default 1
+    segment_size : int, optional
+        number of target returns per segment, by default 25
+
+    Returns
+    -------
+    tuple[np.ndarray, list[OptimisationResult]]
+        target returns and minimum volatility portfolio for each target return
+    """
+    target_returns = np.linspace(expected_returns.min(), expected_returns.max(), n_portfolios)
+    n_segments = max(1, -(-n_portfolios // segment_size))
+    segments = np.array_split(target_returns, n_segments)
+    if max_workers <= 1 or n_segments == 1:
+        segment_results = [_solve_frontier_segment(expected_returns, risk_model, i) for i in segments]
+    else:
+        pool = _get_process_pool(max_workers)
+        segment_results = list(
+            pool.map(
+                _solve_frontier_segment,
+                [expected_returns] * n_segments,
+                [risk_model] * n_segments,
+                segments,
+            )
+        )
+    return target_returns, [result for segment in segment_results for result in segment]
@@ -26,6 +26,33 @@ def get_sample_covariance(security_returns: np.ndarray, frequency: int = 12) ->
     return sample_covariance * frequency
 
 
+def get_moment_sample_covariance(
+    n_obs: int, sums: np.ndarray, product_sums: np.ndarray, frequency: int = 12
+) -> np.ndarray:
+    """Calculate sample covariance from sums of returns and of pairwise return products.
+
+    cov = (Σrr' - Σr Σr' / n) / (n - 1)
+
+    Parameters
+    ----------
+    n_obs : int
+        number of observations
+    sums : np.ndarray
+        (N,) sum of returns
+    product_sums : np.ndarray
+        (N x N) sum of pairwise return products
+    frequency : int, optional
+        number of points per year (252 - daily, 12 - monthly, 1 - yearly), by default 12
+
+    Returns
+    -------
+    np.ndarray
+        sample covariance
+    """
+    sample_covariance = (product_sums - np.outer(sums, sums) / n_obs) / (n_obs - 1)
+    return sample_covariance * frequency
+
+
 def get_leodit_wolf_covariance(security_returns: np.ndarray) -> np.ndarray:
     """Calculate Ledoit-Wolf shrinkage estimate for a particular shrinkage target.
 
@@ -0,0 +1,65 @@
+"""Module for calculating portfolio metrics over rolling windows."""
+
+from collections import deque
+
+import numpy as np
+
+
+def get_rolling_metrics(portfolio_values: np.ndarray, window: int) -> dict[str, np.ndarray]:
+    """Calculate portfolio metrics over each trailing window of monthly returns.
+
+    Windows are updated incrementally as they slide forward one month: running sums of returns and
+    squared returns give the standard deviation, and a monotonic deque of window values gives the
+    peak for drawdown, so a full series costs O(T) rather than O(T x W).
+
+    Parameters
+    ----------
+    portfolio_values : np.ndarray
+        (T,) portfolio values over time
+    window : int
+        number of monthly returns in each window
+
+    Returns
+    -------
+    dict[str, np.ndarray]
+        (T - window,) arrays of portfolio_return, standard_deviation (of monthly returns) and
+        drawdown (from the highest value in the window), entry k is the window ending at month
+        k + window
+    """
+    portfolio_values = np.asarray(portfolio_values, dtype=np.float64)
+    n_windows = max(portfolio_values.shape[0] - window, 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        monthly_returns = portfolio_values[1:] / portfolio_values[:-1] - 1
+    if n_windows == 0:
+        return {name: np.empty(0) for name in ["portfolio_return", "standard_deviation", "drawdown"]}
+
+    # Returns are shifted by the first window mean to limit cancellation in the running sums
+    shifted_returns = (monthly_returns - monthly_returns[:window].mean()).tolist()
+    values = portfolio_values.tolist()
+    variance = np.empty(n_windows)
+    peak_values = np.empty(n_windows)
+    total, total_squares = 0.0, 0.0
+    # Positions of window values in decreasing order of value, the front is the window peak
+    peaks: deque[int] = deque()
+    for t, value in enumerate(values):
+        while peaks and values[peaks[-1]] <= value:
+            peaks.pop()
+        peaks.append(t)
+        if peaks[0] < t - window:
+            peaks.popleft()
+        if t > 0:
+            total += shifted_returns[t - 1]
+            total_squares += shifted_returns[t - 1] ** 2
+        if t > window:
+            total -= shifted_returns[t - 1 - window]
+            total_squares -= shifted_returns[t - 1 - window] ** 2
+        if t >= window:
+            variance[t - window] = (total_squares - total**2 / window) / (window - 1)
+            peak_values[t - window] = values[peaks[0]]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "portfolio_return": portfolio_values[window:] / portfolio_values[:-window] - 1,
+            "standard_deviation": np.sqrt(np.maximum(variance, 0.0)),
+            "drawdown": 1 - portfolio_values[window:] / peak_values,
+        }
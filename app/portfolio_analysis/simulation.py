@@ -0,0 +1,197 @@
+"""Module for simulating forward portfolio values."""
+
+import numpy as np
+
+from app.loader import returns_store
+from app.models import PercentileBand, SimulationResult, SimulationScenario, TerminalValueStatistics
+from app.portfolio_analysis.estimator_cache import get_cached_risk_model
+
+
+def get_stationary_bootstrap_rows(
+    rng: np.random.Generator, n_paths: int, n_months: int, n_history: int, block_size: float
+) -> np.ndarray:
+    """Sample historical months for stationary bootstrap paths.
+
+    Each month starts a new block at a random historical month with probability 1 / block_size,
+    otherwise the block continues with the next historical month (wrapping around), so block
+    lengths are geometric with mean block_size.
+
+    Parameters
+    ----------
+    rng : np.random.Generator
+        random number generator
+    n_paths : int
+        number of paths
+    n_months : int
+        number of months in each path
+    n_history : int
+        number of historical months to sample from
+    block_size : float
+        mean block length in months
+
+    Returns
+    -------
+    np.ndarray
+        (S x H) historical row for each simulated month
+    """
+    new_block = rng.random((n_paths, n_months)) < 1 / block_size
+    new_block[:, 0] = True
+    block_rows = rng.integers(0, n_history, (n_paths, n_months))
+    months = np.arange(n_months)
+    block_start = np.maximum.accumulate(np.where(new_block, months, 0), axis=1)
+    return (np.take_along_axis(block_rows, block_start, axis=1) + months - block_start) % n_history
+
+
+def get_normal_factor(covariance: np.ndarray) -> np.ndarray:
+    """Matrix square root of a (possibly singular) covariance matrix, factor @ factor.T = covariance."""
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    return eigenvectors * np.sqrt(np.maximum(eigenvalues, 0.0))
+
+
+def simulate_portfolio_values(
+    security_returns: np.ndarray,
+    amounts: np.ndarray,
+    n_paths: int,
+    n_months: int,
+    rng: np.random.Generator,
+    block_size: float = 12.0,
+    covariance: np.ndarray | None = None,
+    chunk_size: int = 4_000_000,
+) -> np.ndarray:
+    """Simulate buy and hold portfolio values over many paths in chunks of paths.
+
+    Parameters
+    ----------
+    security_returns : np.ndarray
+        (T x N) historical monthly returns, missing returns as 0
+    amounts : np.ndarray
+        (N,) initial amount invested in each security
+    n_paths : int
+        number of paths
+    n_months : int
+        number of months in each path
+    rng : np.random.Generator
+        random number generator
+    block_size : float, optional
+        mean block length for stationary bootstrap, by default 12.0
+    covariance : np.ndarray | None, optional
+        monthly covariance, returns are drawn from a multivariate normal with historical mean if
+        provided, otherwise bootstrapped, by default None
+    chunk_size : int, optional
+        largest number of simulated returns (paths x months x securities) held at once,
+        by default 4_000_000
+
+    Returns
+    -------
+    np.ndarray
+        (H+1 x S) portfolio values, month 0 is the initial value. Paths are stored along rows so
+        percentiles per month are taken over contiguous memory
+    """
+    n_securities = security_returns.shape[1]
+    paths_per_chunk = max(1, chunk_size // (n_months * n_securities))
+    mean_returns = security_returns.mean(axis=0)
+    factor = None if covariance is None else get_normal_factor(covariance)
+
+    portfolio_values = np.empty((n_months + 1, n_paths))
+    portfolio_values[0] = amounts.sum()
+    for start in range(0, n_paths, paths_per_chunk):
+        n_chunk = min(paths_per_chunk, n_paths - start)
+        if factor is None:
+            rows = get_stationary_bootstrap_rows(
+                rng, n_chunk, n_months, security_returns.shape[0], block_size
+            )
+            simulated_returns = security_returns[rows]
+        else:
+            simulated_returns = rng.standard_normal((n_chunk, n_months, n_securities)) @ factor.T
+            simulated_returns += mean_returns
+            # Securities cannot lose more than their value
+            np.maximum(simulated_returns, -1.0, out=simulated_returns)
+        simulated_returns += 1.0
+        growth = np.cumprod(simulated_returns, axis=1, out=simulated_returns)
+        portfolio_values[1:, start : start + n_chunk] = (growth @ amounts).T
+    return portfolio_values
+
+
+def get_simulation_result(portfolio_values: np.ndarray, percentiles: list[float]) -> SimulationResult:
+    """Summarise simulated paths as percentile bands and terminal value statistics.
+
+    Parameters
+    ----------
+    portfolio_values : np.ndarray
+        (H+1 x S) simulated portfolio values
+    percentiles : list[float]
+        percentiles (0 to 100) to calculate for each month
+
+    Returns
+    -------
+    SimulationResult
+        percentile bands and terminal value statistics
+    """
+    bands = np.percentile(portfolio_values, percentiles, axis=1)
+    terminal_values = portfolio_values[-1]
+    return SimulationResult(
+        percentile_bands=[
+            PercentileBand(percentile=percentile, portfolio_values=band.tolist())
+            for percentile, band in zip(percentiles, bands, strict=True)
+        ],
+        terminal_value=TerminalValueStatistics(
+            mean=float(terminal_values.mean()),
+            standard_deviation=float(terminal_values.std()),
+            min=float(terminal_values.min()),
+            max=float(terminal_values.max()),
+            probability_of_loss=float((terminal_values < portfolio_values[0, 0]).mean()),
+        ),
+    )
+
+
+def simulate(simulation_scenario: SimulationScenario, chunk_size: int = 4_000_000) -> SimulationResult:
+    """Simulate forward portfolio values from historical returns.
+
+    Parameters
+    ----------
+    simulation_scenario : SimulationScenario
+        Simulation settings
+    chunk_size : int, optional
+        largest number of simulated returns held at once, by default 4_000_000
+
+    Returns
+    -------
+    SimulationResult
+        percentile bands and terminal value statistics
+
+    Raises
+    ------
+    ValueError
+        if there are fewer than two months of returns in the date range
+    """
+    # Holdings of the same security are combined
+    amounts: dict[str, float] = {}
+    for holding in simulation_scenario.portfolio:
+        amounts[holding.id] = amounts.get(holding.id, 0.0) + holding.amount
+    ids = list(amounts)
+    security_returns = returns_store.get_returns(
+        ids, simulation_scenario.start_date, simulation_scenario.end_date
+    )
+    if security_returns.height < 2:
+        raise ValueError("At least two months of returns are required to simulate")
+
+    covariance = None
+    if simulation_scenario.method == "normal":
+        covariance = get_cached_risk_model(
+            ids,
+            simulation_scenario.start_date,
+            simulation_scenario.end_date,
+            simulation_scenario.risk_model,
+            frequency=1,
+        )
+    portfolio_values = simulate_portfolio_values(
+        np.nan_to_num(security_returns.drop("date").to_numpy(), nan=0.0),
+        np.fromiter(amounts.values(), dtype=np.float64),
+        simulation_scenario.n_paths,
+        simulation_scenario.n_months,
+        np.random.default_rng(simulation_scenario.seed),
+        simulation_scenario.block_size,
+        covariance,
+        chunk_size,
+    )
+    return get_simulation_result(portfolio_values, simulation_scenario.percentiles)
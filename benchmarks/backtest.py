@@ -0,0 +1,75 @@
+"""Benchmark vectorised backtest kernel against the per-column polars expression chain.
+
+Run with `uv run python -m benchmarks.backtest`.
+"""
+
+import timeit
+from functools import partial
+
+import numpy as np
+import polars as pl
+
+from app.portfolio_analysis.backtest import get_cumulative_growth, get_holding_values, get_missing_returns
+
+SIZES = [(12, 5), (120, 10), (240, 30), (1200, 30), (2400, 100), (6000, 300)]
+REPEATS = 20
+
+
+def polars_backtest(security_returns: pl.DataFrame, amounts: dict[str, float]) -> pl.DataFrame:
+    """Previous backtest implementation, building expressions for every holding."""
+    ids = list(amounts)
+    security_returns = security_returns.with_columns(
+        [
+            pl.when(pl.col("date") == pl.col("date").min()).then(0).otherwise(pl.col(_id)).alias(_id)
+            for _id in ids
+        ]
+    )
+    security_returns = security_returns.with_columns(
+        [(pl.col(_id) + 1.0).cum_prod().alias(_id) - 1.0 for _id in ids]
+    )
+    security_returns = security_returns.with_columns(
+        [((pl.col(_id) + 1.0) * amount).alias(_id) for _id, amount in amounts.items()]
+    )
+    return security_returns.with_columns(pl.sum_horizontal(ids).alias("portfolio_value"))
+
+
+def numpy_backtest(security_returns: pl.DataFrame, amounts: dict[str, float]) -> np.ndarray:
+    """Vectorised backtest on the (T x N) return matrix."""
+    _security_returns = security_returns.select(list(amounts)).to_numpy()
+    _, portfolio_value = get_holding_values(
+        get_cumulative_growth(_security_returns),
+        get_missing_returns(_security_returns),
+        np.fromiter(amounts.values(), dtype=np.float64),
+    )
+    return portfolio_value
+
+
+def main() -> None:
+    """Time both implementations for growing number of months (T) and securities (N)."""
+    rng = np.random.default_rng(42)
+    print(f"{'T':>6} {'N':>5} {'polars (ms)':>12} {'numpy (ms)':>12} {'speedup':>8}")
+    for n_months, n_securities in SIZES:
+        ids = [f"security-{i}" for i in range(n_securities)]
+        security_returns = pl.DataFrame(
+            {
+                "date": pl.date_range(pl.date(1900, 1, 1), pl.date(2500, 1, 1), "1mo", eager=True).head(
+                    n_months
+                ),
+                **dict(zip(ids, rng.normal(0.005, 0.04, (n_securities, n_months)), strict=True)),
+            }
+        )
+        amounts = dict.fromkeys(ids, 100.0)
+        np.testing.assert_allclose(
+            polars_backtest(security_returns, amounts)["portfolio_value"].to_numpy(),
+            numpy_backtest(security_returns, amounts),
+        )
+        polars_time = timeit.timeit(partial(polars_backtest, security_returns, amounts), number=REPEATS)
+        numpy_time = timeit.timeit(partial(numpy_backtest, security_returns, amounts), number=REPEATS)
+        print(
+            f"{n_months:>6} {n_securities:>5} {polars_time / REPEATS * 1e3:>12.3f} "
+            f"{numpy_time / REPEATS * 1e3:>12.3f} {polars_time / numpy_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
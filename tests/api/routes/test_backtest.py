@@ -1,6 +1,11 @@
+import json
+
+import polars as pl
 import pytest
 from httpx import AsyncClient
 
+from app.executor import analysis_executor
+
 
 @pytest.mark.anyio
 async def test_backtest(async_client: AsyncClient) -> None:
@@ -40,3 +45,262 @@ async def test_backtest_validation_error(async_client: AsyncClient) -> None:
     }
     response = await async_client.post("/backtest", json=body)
     assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_batch_backtest(async_client: AsyncClient) -> None:
+    """Batch backtest matches individual backtests."""
+    portfolios = [
+        [
+            {"amount": 100, "id": "vanguard-us-equity-index-fund-gbp-acc"},
+            {"amount": 100, "id": "vanguard-uk-inflation-linked-gilt-index-fund-gbp-acc"},
+        ],
+        [{"amount": 50, "id": "vanguard-uk-inflation-linked-gilt-index-fund-gbp-acc"}],
+    ]
+    body = {"start_date": "2023-11-30", "end_date": "2024-01-31", "portfolios": portfolios}
+    response = await async_client.post("/backtest/batch?include_values=true", json=body)
+    assert response.status_code == 200
+    assert response.json()["dates"][1] == "2023-12-31"
+    results = response.json()["results"]
+    assert len(results) == 2
+    assert results[0]["portfolio_values"][1] == pytest.approx(211.5677910878)
+    assert results[0]["portfolio_values"][2] == pytest.approx(207.67257285005837)
+
+    for portfolio, result in zip(portfolios, results, strict=True):
+        single = await async_client.post(
+            "/backtest",
+            json={"start_date": "2023-11-30", "end_date": "2024-01-31", "portfolio": portfolio},
+        )
+        assert result["metrics"] == pytest.approx(single.json()["metrics"])
+
+
+@pytest.mark.anyio
+async def test_batch_backtest_validation_error(async_client: AsyncClient) -> None:
+    """Batch backtest with invalid security."""
+    body = {
+        "start_date": "2023-11-30",
+        "end_date": "2024-01-31",
+        "portfolios": [[{"amount": 100, "id": "fake_fund"}]],
+    }
+    response = await async_client.post("/backtest/batch", json=body)
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_backtest_columnar(async_client: AsyncClient) -> None:
+    """Backtest with columnar layout, selected by query parameter or Accept header."""
+    body = {
+        "start_date": "2023-11-30",
+        "end_date": "2024-01-31",
+        "portfolio": [
+            {"amount": 100, "id": "vanguard-us-equity-index-fund-gbp-acc"},
+            {
+                "amount": 100,
+                "id": "vanguard-uk-inflation-linked-gilt-index-fund-gbp-acc",
+            },
+        ],
+    }
+    response = await async_client.post("/backtest?layout=columnar", json=body)
+    assert response.status_code == 200
+    portfolio_values = response.json()["portfolio_values"]
+    assert portfolio_values["dates"][1] == "2023-12-31"
+    assert portfolio_values["portfolio_value"][1] == pytest.approx(211.5677910878)
+    assert portfolio_values["holdings"]["vanguard-us-equity-index-fund-gbp-acc"][0] == pytest.approx(100.0)
+
+    response = await async_client.post(
+        "/backtest", json=body, headers={"Accept": "application/vnd.portfoliobuilder.columnar+json"}
+    )
+    assert response.status_code == 200
+    assert response.json()["portfolio_values"] == portfolio_values
+
+
+@pytest.mark.anyio
+async def test_backtest_arrow(async_client: AsyncClient) -> None:
+    """Backtest returned as Arrow IPC stream."""
+    body = {
+        "start_date": "2023-11-30",
+        "end_date": "2024-01-31",
+        "portfolio": [
+            {"amount": 100, "id": "vanguard-us-equity-index-fund-gbp-acc"},
+            {
+                "amount": 100,
+                "id": "vanguard-uk-inflation-linked-gilt-index-fund-gbp-acc",
+            },
+        ],
+    }
+    response = await async_client.post(
+        "/backtest", json=body, headers={"Accept": "application/vnd.apache.arrow.stream"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    portfolio_values = pl.read_ipc_stream(response.content)
+    assert portfolio_values["portfolio_value"][1] == pytest.approx(211.5677910878)
+    assert json.loads(response.headers["x-portfolio-metrics"])["portfolio_return"] == pytest.approx(
+        207.67257285005837 / 200 - 1
+    )
+
+
+@pytest.mark.anyio
+async def test_backtest_extended_metrics(async_client: AsyncClient) -> None:
+    """Extended metrics match statistics derived from portfolio values."""
+    body = {
+        "start_date": "2020-12-31",
+        "end_date": "2023-12-31",
+        "portfolio": [
+            {"amount": 100, "id": "vanguard-us-equity-index-fund-gbp-acc"},
+            {
+                "amount": 100,
+                "id": "vanguard-uk-inflation-linked-gilt-index-fund-gbp-acc",
+            },
+        ],
+    }
+    response = await async_client.post(
+        "/backtest", json=body, params={"extended_metrics": True, "risk_free_rate": 0.012}
+    )
+    assert response.status_code == 200
+    metrics = response.json()["metrics"]
+    values = [i["portfolio_value"] for i in response.json()["portfolio_values"]]
+    monthly_returns = [end / start - 1 for start, end in zip(values[:-1], values[1:], strict=True)]
+    mean_excess_return = sum(monthly_returns) / len(monthly_returns) - 0.001
+    assert metrics["sharpe_ratio"] == pytest.approx(
+        mean_excess_return / metrics["standard_deviation"] * 12**0.5
+    )
+    assert metrics["calmar_ratio"] == pytest.approx(metrics["cagr"] / metrics["max_drawdown"])
+    assert metrics["best_month"] == pytest.approx(max(monthly_returns))
+    assert metrics["worst_month"] == pytest.approx(min(monthly_returns))
+    assert metrics["conditional_value_at_risk"] >= metrics["value_at_risk"]
+
+    longest, current, peak = 0, 0, values[0]
+    for value in values:
+        peak = max(peak, value)
+        current = current + 1 if value < peak else 0
+        longest = max(longest, current)
+    assert metrics["max_drawdown_duration"] == longest
+
+    response = await async_client.post("/backtest", json=body)
+    assert "sharpe_ratio" not in response.json()["metrics"]
+
+
+@pytest.mark.anyio
+async def test_rolling_backtest(async_client: AsyncClient) -> None:
+    """Rolling metrics match statistics recomputed for each window."""
+    body = {
+        "start_date": "2018-12-31",
+        "end_date": "2023-12-31",
+        "portfolio": [
+            {"amount": 100, "id": "vanguard-us-equity-index-fund-gbp-acc"},
+            {
+                "amount": 100,
+                "id": "vanguard-uk-inflation-linked-gilt-index-fund-gbp-acc",
+            },
+        ],
+    }
+    response = await async_client.post("/backtest/rolling", json=body, params={"window": 12})
+    assert response.status_code == 200
+    rolling_metrics = response.json()["metrics"]
+    portfolio_values = (await async_client.post("/backtest", json=body)).json()["portfolio_values"]
+    values = [i["portfolio_value"] for i in portfolio_values]
+    assert len(rolling_metrics) == len(values) - 12
+    for k, metrics in enumerate(rolling_metrics):
+        window_values = values[k : k + 13]
+        monthly_returns = [
+            end / start - 1 for start, end in zip(window_values[:-1], window_values[1:], strict=True)
+        ]
+        mean_return = sum(monthly_returns) / 12
+        assert metrics["date"] == portfolio_values[k + 12]["date"]
+        assert metrics["portfolio_return"] == pytest.approx(window_values[-1] / window_values[0] - 1)
+        assert metrics["standard_deviation"] == pytest.approx(
+            (sum((r - mean_return) ** 2 for r in monthly_returns) / 11) ** 0.5
+        )
+        assert metrics["drawdown"] == pytest.approx(1 - window_values[-1] / max(window_values))
+
+    response = await async_client.post("/backtest/rolling", json=body, params={"window": 1})
+    assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_backtest_rebalancing(async_client: AsyncClient) -> None:
+    """Monthly rebalancing resets holdings to initial weights after every month."""
+    body = {
+        "start_date": "2022-12-31",
+        "end_date": "2023-12-31",
+        "portfolio": [
+            {"amount": 60, "id": "vanguard-us-equity-index-fund-gbp-acc"},
+            {
+                "amount": 40,
+                "id": "vanguard-uk-inflation-linked-gilt-index-fund-gbp-acc",
+            },
+        ],
+    }
+    buy_and_hold = (await async_client.post("/backtest", json=body)).json()["portfolio_values"]
+    response = await async_client.post("/backtest", json=body | {"rebalance_frequency": "monthly"})
+    assert response.status_code == 200
+    rebalanced = response.json()["portfolio_values"]
+
+    expected_value = 100.0
+    for previous, current, row in zip(buy_and_hold[:-1], buy_and_hold[1:], rebalanced[1:], strict=True):
+        growth = [
+            end["amount"] / start["amount"]
+            for start, end in zip(previous["holdings"], current["holdings"], strict=True)
+        ]
+        expected_value *= 0.6 * growth[0] + 0.4 * growth[1]
+        assert row["portfolio_value"] == pytest.approx(expected_value)
+        assert row["holdings"][0]["amount"] == pytest.approx(0.6 * expected_value)
+
+    response = await async_client.post("/backtest", json=body | {"rebalance_tolerance": 0.0})
+    assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_simulate(async_client: AsyncClient) -> None:
+    """Simulation is reproducible with a seed and percentile bands are ordered."""
+    body = {
+        "start_date": "2013-12-31",
+        "end_date": "2023-12-31",
+        "portfolio": [
+            {"amount": 100, "id": "vanguard-us-equity-index-fund-gbp-acc"},
+            {
+                "amount": 100,
+                "id": "vanguard-uk-inflation-linked-gilt-index-fund-gbp-acc",
+            },
+        ],
+        "n_paths": 2000,
+        "n_months": 24,
+        "percentiles": [5, 50, 95],
+        "seed": 42,
+    }
+    for method in ["bootstrap", "normal"]:
+        response = await async_client.post("/backtest/simulate", json=body | {"method": method})
+        assert response.status_code == 200
+        result = response.json()
+        bands = [band["portfolio_values"] for band in result["percentile_bands"]]
+        assert [len(band) for band in bands] == [25, 25, 25]
+        assert bands[0][0] == bands[2][0] == pytest.approx(200.0)
+        assert all(low <= mid <= high for low, mid, high in zip(*bands, strict=True))
+        assert result["terminal_value"]["min"] <= bands[0][-1]
+        assert 0 <= result["terminal_value"]["probability_of_loss"] <= 1
+
+        response = await async_client.post("/backtest/simulate", json=body | {"method": method})
+        assert response.json() == result
+
+    response = await async_client.post(
+        "/backtest/simulate", json=body | {"start_date": "2023-12-31", "end_date": "2023-12-31"}
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_backtest_analysis_queue_full(
+    async_client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Backtest is rejected with 503 when no analysis calls can be admitted."""
+    body = {
+        "start_date": "2023-11-30",
+        "end_date": "2024-01-31",
+        "portfolio": [{"amount": 100, "id": "vanguard-us-equity-index-fund-gbp-acc"}],
+    }
+    monkeypatch.setattr(analysis_executor, "max_queue_depth", 0)
+    response = await async_client.post("/backtest", json=body)
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert (await async_client.get("/health")).status_code == 200
@@ -1,6 +1,11 @@
+import polars as pl
 import pytest
 from httpx import AsyncClient
 
+from app.config import settings
+from app.executor import analysis_executor
+from app.portfolio_analysis.estimator_cache import estimator_cache
+
 
 @pytest.mark.anyio
 async def test_expected_returns(async_client: AsyncClient) -> None:
@@ -84,6 +89,8 @@ async def test_mean_var_opt(async_client: AsyncClient) -> None:
     assert response.status_code == 200
     assert response.json()[0]["id"] == "vanguard-japan-stock-index-fund-gbp-acc"
     assert response.json()[0]["amount"] == pytest.approx(0.6367681970235963)
+    assert int(response.headers["x-optimiser-iterations"]) > 0
+    assert int(response.headers["x-optimiser-function-evaluations"]) > 0
 
 
 @pytest.mark.anyio
@@ -107,6 +114,168 @@ async def test_efficient_frontier(async_client: AsyncClient) -> None:
     assert response.json()[0]["implied_standard_deviation"] == pytest.approx(0.15403819424142662)
 
     assert response.json()[1]["portfolio"][1]["id"] == "vanguard-us-equity-index-fund-gbp-acc"
-    assert response.json()[1]["portfolio"][1]["amount"] == pytest.approx(0.21194273812607567)
+    assert response.json()[1]["portfolio"][1]["amount"] == pytest.approx(0.2124871926768971)
     assert response.json()[1]["expected_return"] == pytest.approx(0.03387391520563446)
-    assert response.json()[1]["implied_standard_deviation"] == pytest.approx(0.10300850012002749)
+    assert response.json()[1]["implied_standard_deviation"] == pytest.approx(0.1030084359527629)
+
+
+@pytest.mark.anyio
+async def test_efficient_frontier_parallel(
+    async_client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test efficient frontier solved in segments across a process pool matches serial solve."""
+    body = {
+        "end_date": "2024-01-01",
+        "ids": [
+            "vanguard-japan-stock-index-fund-gbp-acc",
+            "vanguard-us-equity-index-fund-gbp-acc",
+            "vanguard-uk-long-duration-gilt-index-fund-gbp-acc",
+        ],
+        "start_date": "2018-01-01",
+    }
+    serial = await async_client.post("/optimisation/efficient-frontier?n_portfolios=10", json=body)
+
+    monkeypatch.setattr(settings, "frontier_max_workers", 2)
+    monkeypatch.setattr(settings, "frontier_segment_size", 3)
+    parallel = await async_client.post("/optimisation/efficient-frontier?n_portfolios=10", json=body)
+    assert parallel.status_code == 200
+    assert len(parallel.json()) == 10
+    for serial_portfolio, parallel_portfolio in zip(serial.json(), parallel.json(), strict=True):
+        assert parallel_portfolio["implied_standard_deviation"] == pytest.approx(
+            serial_portfolio["implied_standard_deviation"]
+        )
+
+
+@pytest.mark.anyio
+async def test_risk_model_arrow(async_client: AsyncClient) -> None:
+    """Test risk model returned as Arrow IPC stream."""
+    body = {
+        "end_date": "2024-01-01",
+        "ids": [
+            "vanguard-japan-stock-index-fund-gbp-acc",
+            "vanguard-us-equity-index-fund-gbp-acc",
+            "vanguard-uk-long-duration-gilt-index-fund-gbp-acc",
+        ],
+        "start_date": "2018-01-01",
+    }
+
+    response = await async_client.post(
+        "/optimisation/risk-model?method=sample_cov",
+        json=body,
+        headers={"Accept": "application/vnd.apache.arrow.stream"},
+    )
+    assert response.status_code == 200
+    risk_model = pl.read_ipc_stream(response.content)
+    assert risk_model["id"][0] == "vanguard-japan-stock-index-fund-gbp-acc"
+    assert risk_model["vanguard-japan-stock-index-fund-gbp-acc"][0] == pytest.approx(0.014459938441312102)
+
+    response = await async_client.post(
+        "/optimisation/expected-returns",
+        json=body,
+        headers={"Accept": "application/vnd.apache.arrow.stream"},
+    )
+    assert response.status_code == 200
+    expected_returns = pl.read_ipc_stream(response.content)
+    assert expected_returns["expected_return"][0] == pytest.approx(0.04195386143466284)
+
+
+@pytest.mark.anyio
+async def test_efficient_frontier_cla(async_client: AsyncClient) -> None:
+    """Test critical line algorithm frontier matches SLSQP frontier."""
+    body = {
+        "end_date": "2024-01-01",
+        "ids": [
+            "vanguard-japan-stock-index-fund-gbp-acc",
+            "vanguard-us-equity-index-fund-gbp-acc",
+            "vanguard-uk-long-duration-gilt-index-fund-gbp-acc",
+        ],
+        "start_date": "2018-01-01",
+    }
+
+    response = await async_client.post(
+        "/optimisation/efficient-frontier?n_portfolios=3&method=cla", json=body
+    )
+    assert response.status_code == 200
+    assert int(response.headers["x-corner-portfolios"]) > 0
+    assert response.json()[0]["portfolio"][0]["amount"] == pytest.approx(0.0, abs=1e-9)
+    assert response.json()[0]["expected_return"] == pytest.approx(-0.05346345590292251)
+    assert response.json()[0]["implied_standard_deviation"] == pytest.approx(0.15403819424142662)
+
+    assert response.json()[1]["portfolio"][1]["amount"] == pytest.approx(0.21248797732141309)
+    assert response.json()[1]["expected_return"] == pytest.approx(0.03387391520563446)
+    assert response.json()[1]["implied_standard_deviation"] == pytest.approx(0.1030084359527629)
+
+
+@pytest.mark.anyio
+async def test_estimator_cache(async_client: AsyncClient) -> None:
+    """Test repeated scenarios, in any id order, reuse cached estimates."""
+    ids = [
+        "vanguard-japan-stock-index-fund-gbp-acc",
+        "vanguard-us-equity-index-fund-gbp-acc",
+        "vanguard-uk-long-duration-gilt-index-fund-gbp-acc",
+    ]
+    body = {"end_date": "2024-01-01", "ids": ids, "start_date": "2017-01-01"}
+
+    first = await async_client.post("/optimisation/risk-model?method=sample_cov", json=body)
+    stats = (await async_client.get("/optimisation/cache")).json()
+    second = await async_client.post(
+        "/optimisation/risk-model?method=sample_cov", json={**body, "ids": ids[::-1]}
+    )
+    assert (await async_client.get("/optimisation/cache")).json()["hits"] == stats["hits"] + 1
+    assert second.json()[2]["id"] == first.json()[0]["id"]
+    assert second.json()[2][ids[1]] == pytest.approx(first.json()[0][ids[1]])
+
+
+@pytest.mark.anyio
+async def test_risk_model_prefix_covariance(
+    async_client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test sample covariance from prefix sums matches a pass over returns."""
+    body = {
+        "end_date": "2022-06-30",
+        "ids": [
+            "vanguard-japan-stock-index-fund-gbp-acc",
+            "vanguard-us-equity-index-fund-gbp-acc",
+            "vanguard-uk-long-duration-gilt-index-fund-gbp-acc",
+        ],
+        "start_date": "2012-01-01",
+    }
+    monkeypatch.setattr(settings, "prefix_covariance", False)
+    estimator_cache.clear()
+    expected = await async_client.post("/optimisation/risk-model?method=sample_cov", json=body)
+
+    monkeypatch.setattr(settings, "prefix_covariance", True)
+    estimator_cache.clear()
+    response = await async_client.post("/optimisation/risk-model?method=sample_cov", json=body)
+    assert response.status_code == 200
+    for row, expected_row in zip(response.json(), expected.json(), strict=True):
+        for _id in body["ids"]:
+            assert row[_id] == pytest.approx(expected_row[_id])
+
+
+@pytest.mark.anyio
+async def test_analysis_process_pool(async_client: AsyncClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test optimisation and risk models dispatched to analysis workers match inline results."""
+    body = {
+        "end_date": "2024-01-01",
+        "ids": [
+            "vanguard-us-equity-index-fund-gbp-acc",
+            "vanguard-uk-long-duration-gilt-index-fund-gbp-acc",
+        ],
+        "start_date": "2018-01-01",
+    }
+    inline = await async_client.post("/optimisation/mean-variance", json=body)
+
+    estimator_cache.clear()
+    monkeypatch.setattr(analysis_executor, "max_workers", 2)
+    try:
+        analysis_executor.start()
+        dispatched = await async_client.post("/optimisation/mean-variance", json=body)
+        risk_model = await async_client.post("/optimisation/risk-model?method=ledoit_wolf", json=body)
+    finally:
+        analysis_executor.shutdown()
+    assert dispatched.status_code == 200
+    for inline_holding, dispatched_holding in zip(inline.json(), dispatched.json(), strict=True):
+        assert dispatched_holding["amount"] == pytest.approx(inline_holding["amount"])
+    assert risk_model.status_code == 200
+    assert analysis_executor.pending == 0
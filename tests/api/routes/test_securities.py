@@ -23,3 +23,34 @@ async def test_securities_sedol_validation_error(async_client: AsyncClient) -> N
     """Test getting details for single invalid security."""
     response = await async_client.get("/securities/FAKEsedol/")
     assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_securities_lookup(async_client: AsyncClient) -> None:
+    """Test bulk lookup by ids and sedols."""
+    body = {
+        "ids": ["vanguard-us-equity-index-fund-gbp-acc", "fake_fund"],
+        "sedols": ["B50MZ94", "FAKEsedol"],
+    }
+    response = await async_client.post("/securities/lookup", json=body)
+    assert response.status_code == 200
+    assert [i["id"] for i in response.json()["securities"]] == [
+        "vanguard-us-equity-index-fund-gbp-acc",
+        "vanguard-japan-stock-index-fund-gbp-acc",
+    ]
+    assert response.json()["missing_ids"] == ["fake_fund"]
+    assert response.json()["missing_sedols"] == ["FAKEsedol"]
+
+
+@pytest.mark.anyio
+async def test_securities_etag(async_client: AsyncClient) -> None:
+    """Test details for all securities are served with ETag and revalidated with 304."""
+    response = await async_client.get("/securities/all/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "max-age" in response.headers["cache-control"]
+    etag = response.headers["etag"]
+
+    response = await async_client.get("/securities/all/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
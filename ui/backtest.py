@@ -1,10 +1,12 @@
 """Module for backtesting page."""
 
+import json
 from datetime import date
 from typing import Any
 
 import altair as alt
 import pandas as pd
+import pyarrow as pa
 import requests
 import streamlit as st
 from config import settings
@@ -25,35 +27,19 @@ def get_funds() -> Any:
 
 
 @st.cache_data(ttl="7d")
-def backtest_portfolio(start_date: str, end_date: str, portfolio: list[dict[str, str | int]]) -> Any:
-    """Backtest a given portfolio."""
+def backtest_portfolio(
+    start_date: str, end_date: str, portfolio: list[dict[str, str | int]]
+) -> tuple[pd.DataFrame, dict[str, float]]:
+    """Backtest a given portfolio, returning portfolio values and metrics."""
     r = requests.post(
         f"{settings.base_url}{settings.backtest_path}",
-        headers={"Content-Type": "application/json"},
+        headers={"Content-Type": "application/json", "Accept": settings.arrow_media_type},
         json={"start_date": start_date, "end_date": end_date, "portfolio": portfolio},
         timeout=settings.timeout,
     )
     r.raise_for_status()
-    return r.json()
-
-
-def convert_to_df(backtest_results: Any) -> pd.DataFrame:
-    """Convert backtest result into dataframe."""
-    detailed_holdings = []
-    for i in backtest_results["portfolio_values"]:
-        _result = {}
-        for holding in i["holdings"]:
-            _result[holding["id"]] = holding["amount"]
-        detailed_holdings.append(_result)
-
-    df = pd.concat(
-        [
-            pd.DataFrame(backtest_results["portfolio_values"])[["date", "portfolio_value"]],
-            pd.DataFrame(detailed_holdings),
-        ],
-        axis=1,
-    )
-    return df
+    portfolio_values = pa.ipc.open_stream(r.content).read_pandas(date_as_object=False)
+    return portfolio_values, json.loads(r.headers["X-Portfolio-Metrics"])
 
 
 def line_chart(backtest_result: pd.DataFrame) -> alt.Chart:
@@ -94,11 +80,10 @@ def main() -> None:
     portfolio = [{"id": id, "amount": st.sidebar.number_input(label=id, value=100)} for id in ids]
 
     # Run backtest and format
-    _backtest_result = backtest_portfolio(start_date, end_date, portfolio)
-    backtest_result = convert_to_df(_backtest_result)
+    backtest_result, _metrics = backtest_portfolio(start_date, end_date, portfolio)
 
     # Format metrics
-    metrics = pd.DataFrame(_backtest_result["metrics"], index=pd.Index([0]))
+    metrics = pd.DataFrame(_metrics, index=pd.Index([0]))
     metrics = metrics.style.format("{:,.2%}")
 
     # Main page
@@ -15,6 +15,7 @@ class StreamlitSettings(BaseSettings):
     expected_return_path: str = "/optimisation/expected-returns"
     risk_model_path: str = "/optimisation/risk-model?method=sample_cov"
     efficient_fronter_path: str = "/optimisation/efficient-frontier"
+    arrow_media_type: str = "application/vnd.apache.arrow.stream"
     color_primary: str = "teal"
     color_scale: str = "teals"
 
@@ -6,6 +6,7 @@ from typing import Any
 import altair as alt
 import numpy as np
 import pandas as pd
+import pyarrow as pa
 import requests
 import streamlit as st
 from config import settings
@@ -27,29 +28,29 @@ def get_funds() -> Any:
 
 
 @st.cache_data(ttl="7d")
-def get_expected_returns(start_date: str, end_date: str, ids: list[str]) -> Any:
+def get_expected_returns(start_date: str, end_date: str, ids: list[str]) -> pd.DataFrame:
     """Get expected returns."""
     r = requests.post(
         f"{settings.base_url}{settings.expected_return_path}",
-        headers={"Content-Type": "application/json"},
+        headers={"Content-Type": "application/json", "Accept": settings.arrow_media_type},
         json={"start_date": start_date, "end_date": end_date, "ids": ids},
         timeout=settings.timeout,
     )
     r.raise_for_status()
-    return r.json()
+    return pa.ipc.open_stream(r.content).read_pandas()
 
 
 @st.cache_data(ttl="7d")
-def get_risk_model(start_date: str, end_date: str, ids: list[str]) -> Any:
+def get_risk_model(start_date: str, end_date: str, ids: list[str]) -> pd.DataFrame:
     """Get risk model."""
     r = requests.post(
         f"{settings.base_url}{settings.risk_model_path}",
-        headers={"Content-Type": "application/json"},
+        headers={"Content-Type": "application/json", "Accept": settings.arrow_media_type},
         json={"start_date": start_date, "end_date": end_date, "ids": ids},
         timeout=settings.timeout,
     )
     r.raise_for_status()
-    return r.json()
+    return pa.ipc.open_stream(r.content).read_pandas()
 
 
 @st.cache_data(ttl="7d")
@@ -148,8 +149,8 @@ def main() -> None:
     )
 
     # Returns & risk models for funds
-    fund_profiles = pd.DataFrame(get_expected_returns(start_date, end_date, ids))
-    risk_model = pd.DataFrame(get_risk_model(start_date, end_date, ids))
+    fund_profiles = get_expected_returns(start_date, end_date, ids)
+    risk_model = get_risk_model(start_date, end_date, ids)
     fund_profiles["implied_standard_deviation"] = np.sqrt(np.diag(risk_model.drop(columns="id").to_numpy()))
 
     # Generate and format efficient frontier